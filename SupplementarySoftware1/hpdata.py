@@ -0,0 +1,298 @@
+import os
+import sys
+import csv
+import json
+import hashlib
+import subprocess
+import numpy as np
+
+try:
+    from backports import lzma
+except ImportError:
+    try:
+        import lzma
+    except ImportError:
+        # decompressed by the xz command instead
+        lzma = None
+
+DATA_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+SCHEMA = "schema.json"
+
+CHUNK_SIZE = 1 << 18
+CHUNK_ROWS = 20000
+MISSING = ("","NA")
+DTYPES = {"int": "<i8", "float": "<f8", "string": "<u4"}
+
+# the tables of data/: source file, csv quoting (as read.table reads them in the Rmd) and filter names
+# standing for columns, e.g. participant="A01" for the condition of the chains
+class Source(object):
+    def __init__(self, file_name, quoting=csv.QUOTE_NONE, aliases=None):
+        self.file_name = file_name
+        self.quoting = quoting
+        self.aliases = aliases or {}
+
+TABLES = {"chains": Source("HPshape-nonreplicated-chains.csv.xz", aliases={"participant": "condition", "chain": "replication"}),
+          "tracings": Source("hard-palate-tracings.tsv.xz", aliases={"participant": "ID"}),
+          "vowel_corpus": Source("BeckerVowelCorpus.txt.xz", csv.QUOTE_MINIMAL, aliases={"language": "ISO"}),
+          "trad_measures": Source("trad_measures.tsv", aliases={"participant": "ID"}),
+          "participants": Source("participant_info.csv", aliases={"participant": "ID"})}
+
+# raw bytes of a data file, decompressed on the fly for .xz, chunk_size bytes read at a time
+def iterChunks(path, chunk_size=CHUNK_SIZE):
+    with open(path, 'rb') as source_file:
+        chunks = iter(lambda: source_file.read(chunk_size), "")
+
+        if not path.endswith(".xz"):
+            for chunk in chunks:
+                yield chunk
+            return
+
+        if lzma is not None:
+            decompressor = lzma.LZMADecompressor()
+
+            for chunk in chunks:
+                while chunk:
+                    yield decompressor.decompress(chunk)
+
+                    # files of several xz streams
+                    (chunk,decompressor) = (decompressor.unused_data,lzma.LZMADecompressor()) if decompressor.eof else ("",decompressor)
+            return
+
+    process = subprocess.Popen(["xz", "-dc", path], stdout=subprocess.PIPE)
+
+    for chunk in iter(lambda: process.stdout.read(chunk_size), ""):
+        yield chunk
+
+    if process.wait() != 0:
+        raise IOError("xz could not decompress " + path)
+
+def iterLines(path):
+    rest = ""
+
+    for chunk in iterChunks(path):
+        lines = (rest + chunk).split("\n")
+        rest = lines.pop()
+
+        for line in lines:
+            yield line.rstrip("\r")
+
+    if rest.rstrip("\r"):
+        yield rest.rstrip("\r")
+
+# rows of a table, header first, without keeping more than a chunk in memory
+def iterRows(name, data_root=DATA_ROOT):
+    source = TABLES[name]
+    return csv.reader(iterLines(os.path.join(data_root, source.file_name)), delimiter="\t", quoting=source.quoting)
+
+# header, then lists of up to n_rows rows, short rows padded
+def iterRowChunks(rows, n_rows=CHUNK_ROWS):
+    header = rows.next()
+    yield header
+
+    chunk = []
+    for row in rows:
+        chunk.append(row + [""] * (len(header) - len(row)))
+
+        if len(chunk) == n_rows:
+            yield chunk
+            chunk = []
+
+    if len(chunk):
+        yield chunk
+
+def fileDigest(path, block_size=1 << 20):
+    digest = hashlib.sha1()
+
+    with open(path, 'rb') as source_file:
+        for block in iter(lambda: source_file.read(block_size), ""):
+            digest.update(block)
+
+    return digest.hexdigest()
+
+def numeric(values, dtype):
+    return np.array(["nan" if value in MISSING else value for value in values]).astype(dtype)
+
+# narrowest kind each column fits: int, float (missing values as nan) or string
+def columnKinds(chunks, n_columns):
+    kinds = ["int"] * n_columns
+
+    for chunk in chunks:
+        for (i_column,values) in enumerate(zip(*chunk)):
+            for kind in ("int","float")[("int","float","string").index(kinds[i_column]):]:
+                try:
+                    if kind == "int" and any(value in MISSING for value in values):
+                        raise ValueError
+                    numeric(values, DTYPES[kind])
+                    break
+                except ValueError:
+                    kinds[i_column] = "float" if kind == "int" else "string"
+
+    return kinds
+
+# one little-endian file per column plus schema.json, like the summary columns of SupplementarySoftware3;
+# strings are dictionary-encoded. two streaming passes over the source: column kinds, then values.
+# the schema is written last, so a cache without one is incomplete
+def buildCache(name, cache_path, data_root=DATA_ROOT):
+    source_path = os.path.join(data_root, TABLES[name].file_name)
+
+    if not os.path.exists(cache_path):
+        os.makedirs(cache_path)
+    if os.path.exists(os.path.join(cache_path, SCHEMA)):
+        os.remove(os.path.join(cache_path, SCHEMA))
+
+    chunks = iterRowChunks(iterRows(name, data_root))
+    header = chunks.next()
+    kinds = columnKinds(chunks, len(header))
+
+    columns = [{"name": column_name, "kind": kind, "dtype": DTYPES[kind], "file": "%03d.bin" % i_column}
+               for (i_column,(column_name,kind)) in enumerate(zip(header, kinds))]
+    codes = [{} for _ in columns]
+    files = [open(os.path.join(cache_path, column["file"]), 'wb') for column in columns]
+    n_rows = 0
+
+    try:
+        chunks = iterRowChunks(iterRows(name, data_root))
+        chunks.next()
+
+        for chunk in chunks:
+            for (column,column_codes,column_file,values) in zip(columns, codes, files, zip(*chunk)):
+                if column["kind"] == "string":
+                    values = [column_codes.setdefault(value, len(column_codes)) for value in values]
+                    np.asarray(values, dtype=column["dtype"]).tofile(column_file)
+                else:
+                    numeric(values, column["dtype"]).tofile(column_file)
+
+            n_rows += len(chunk)
+    finally:
+        for column_file in files:
+            column_file.close()
+
+    for (column,column_codes) in zip(columns, codes):
+        if column["kind"] == "string":
+            column["dictionary"] = sorted(column_codes, key=column_codes.get)
+
+    info = os.stat(source_path)
+    schema = {"source": TABLES[name].file_name, "size": info.st_size, "mtime": info.st_mtime,
+              "sha1": fileDigest(source_path), "n_rows": n_rows, "columns": columns}
+    writeSchema(cache_path, schema)
+
+    return schema
+
+def writeSchema(cache_path, schema):
+    schema_path = os.path.join(cache_path, SCHEMA)
+
+    with open(schema_path + ".tmp", 'wb') as schema_file:
+        json.dump(schema, schema_file, indent=1)
+
+    # windows does not rename onto an existing file
+    if os.path.exists(schema_path):
+        os.remove(schema_path)
+    os.rename(schema_path + ".tmp", schema_path)
+
+def readSchema(cache_path):
+    try:
+        with open(os.path.join(cache_path, SCHEMA), 'rb') as schema_file:
+            schema = json.load(schema_file)
+    except (IOError,ValueError):
+        return None
+
+    # byte strings, as the rows read from the source
+    for column in schema["columns"]:
+        column["name"] = column["name"].encode("utf-8")
+        if "dictionary" in column:
+            column["dictionary"] = [value.encode("utf-8") for value in column["dictionary"]]
+
+    return schema
+
+# a table of data/ through its columnar cache (data/_cache/<name>), built on first use and rebuilt when the
+# checksum of the source changes; columns are mapped from disk, so only the columns and rows used are read
+class Table(object):
+    def __init__(self, name, data_root=DATA_ROOT, cache_root=None, rebuild=False):
+        self.name = name
+        self.source = TABLES[name]
+        self.cache_path = os.path.join(cache_root or os.path.join(data_root, "_cache"), name)
+
+        source_path = os.path.join(data_root, self.source.file_name)
+        info = os.stat(source_path)
+        schema = None if rebuild else readSchema(self.cache_path)
+
+        # the checksum is only computed when the file looks changed
+        if schema is not None and (schema["size"],schema["mtime"]) != (info.st_size,info.st_mtime):
+            if fileDigest(source_path) == schema["sha1"]:
+                (schema["size"],schema["mtime"]) = (info.st_size,info.st_mtime)
+                writeSchema(self.cache_path, schema)
+            else:
+                schema = None
+
+        self.schema = schema or buildCache(name, self.cache_path, data_root)
+        self.columns = dict((column["name"], column) for column in self.schema["columns"])
+        self.n_rows = self.schema["n_rows"]
+
+    def names(self):
+        return [column["name"] for column in self.schema["columns"]]
+
+    # stored values of a column: numbers, or dictionary codes for strings
+    def raw(self, name):
+        column = self.columns[self.source.aliases.get(name, name)]
+
+        if self.n_rows == 0:
+            return np.zeros(0, dtype=column["dtype"])
+        return np.memmap(os.path.join(self.cache_path, column["file"]), dtype=column["dtype"], mode='r', shape=(self.n_rows,))
+
+    def decode(self, name, values):
+        column = self.columns[self.source.aliases.get(name, name)]
+
+        if column["kind"] == "string":
+            return np.asarray(column["dictionary"])[values]
+        return np.asarray(values)
+
+    def column(self, name):
+        return self.decode(name, self.raw(name))
+
+    # indices of the rows matching every filter, a filter being a value or a list of values of a column
+    # (or of a filter name such as participant, chain or vowel)
+    def rowIndex(self, **filters):
+        mask = np.ones(self.n_rows, dtype=bool)
+
+        for (name,values) in filters.items():
+            column = self.columns[self.source.aliases.get(name, name)]
+            values = list(values) if isinstance(values, (list,tuple,set)) else [values]
+
+            if column["kind"] == "string":
+                dictionary = dict((value, code) for (code,value) in enumerate(column["dictionary"]))
+                values = [dictionary[str(value)] for value in values if str(value) in dictionary]
+
+            mask &= np.in1d(self.raw(name), np.asarray(values, dtype=column["dtype"]))
+
+        return np.flatnonzero(mask)
+
+    # the given columns (all by default) of the matching rows, as arrays
+    def select(self, columns=None, **filters):
+        rows = self.rowIndex(**filters)
+        return dict((name, self.decode(name, self.raw(name)[rows])) for name in (columns or self.names()))
+
+def chains(columns=None, **filters):
+    return Table("chains").select(columns, **filters)
+
+def tracings(columns=None, **filters):
+    return Table("tracings").select(columns, **filters)
+
+def vowelCorpus(columns=None, **filters):
+    return Table("vowel_corpus").select(columns, **filters)
+
+def tradMeasures(columns=None, **filters):
+    return Table("trad_measures").select(columns, **filters)
+
+def participants(columns=None, **filters):
+    return Table("participants").select(columns, **filters)
+
+# hpdata.py [--rebuild] [table...]: build (or check) the caches and describe the tables
+if __name__ == "__main__":
+    names = [arg for arg in sys.argv[1:] if not arg.startswith("--")] or sorted(TABLES)
+
+    for name in names:
+        table = Table(name, rebuild="--rebuild" in sys.argv)
+        kinds = [column["kind"] for column in table.schema["columns"]]
+
+        print "%s: %d rows, %d columns (%d int, %d float, %d string)" % \
+            (name, table.n_rows, len(kinds), kinds.count("int"), kinds.count("float"), kinds.count("string"))
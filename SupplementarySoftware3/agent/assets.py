@@ -0,0 +1,122 @@
+import os
+import stat
+import json
+import shutil
+import hashlib
+
+MANIFEST = "assets.json"
+
+# hardlink, then symlink, then copy as a last resort
+def linkFile(source, destination):
+    if os.path.exists(destination):
+        os.remove(destination)
+
+    try:
+        os.link(source, destination)
+        return "hardlink"
+    except (AttributeError,OSError):
+        pass
+
+    # python 2 has no os.link on windows
+    if os.name == "nt":
+        import ctypes
+
+        if ctypes.windll.kernel32.CreateHardLinkW(unicode(destination), unicode(source), None):
+            return "hardlink"
+
+    try:
+        os.symlink(os.path.abspath(source), destination)
+        return "symlink"
+    except (AttributeError,OSError):
+        pass
+
+    shutil.copyfile(source, destination)
+    return "copy"
+
+def fileDigest(path):
+    digest = hashlib.sha1()
+
+    with open(path, 'rb') as input_file:
+        for block in iter(lambda: input_file.read(1 << 16), ""):
+            digest.update(block)
+
+    return digest.hexdigest()
+
+# content-addressed store for the inputs shared by many reps (anatomy, targets, configs)
+class AssetStore(object):
+    def __init__(self, store_path):
+        self.store_path = store_path
+        # (path, size, mtime) -> digest, so unchanged sources are not hashed again
+        self.digests = {}
+
+        if not os.path.exists(store_path):
+            os.makedirs(store_path)
+
+    def digest(self, source):
+        info = os.stat(source)
+        key = (os.path.abspath(source),info.st_size,info.st_mtime)
+
+        try:
+            return self.digests[key]
+        except KeyError:
+            digest = self.digests[key] = fileDigest(source)
+            return digest
+
+    def add(self, source):
+        digest = self.digest(source)
+        stored = os.path.join(self.store_path, digest)
+
+        if not os.path.exists(stored):
+            temp = stored + "." + str(os.getpid())
+            shutil.copyfile(source, temp)
+
+            # reps share the file, so keep it from being changed through one of them
+            if os.name != "nt":
+                os.chmod(temp, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+
+            try:
+                os.rename(temp, stored)
+            # added concurrently by another process
+            except OSError:
+                os.remove(temp)
+
+        return (digest,stored)
+
+    # link items (name, source file) into a rep and record their versions there
+    def linkInto(self, rep_path, items):
+        manifest = readManifest(rep_path)
+
+        for (name,source) in items:
+            (digest,stored) = self.add(source)
+            linkFile(stored, os.path.join(rep_path, name))
+            manifest[name] = digest
+
+        writeManifest(rep_path, manifest)
+
+    # carry assets over from one rep to the next, without hashing them again
+    def linkFrom(self, src_path, rep_path, names):
+        (src_manifest,manifest) = (readManifest(src_path),readManifest(rep_path))
+
+        for name in names:
+            stored = os.path.join(self.store_path, src_manifest.get(name, ""))
+
+            if name in src_manifest and os.path.exists(stored):
+                digest = src_manifest[name]
+            else:
+                (digest,stored) = self.add(os.path.join(src_path, name))
+
+            linkFile(stored, os.path.join(rep_path, name))
+            manifest[name] = digest
+
+        writeManifest(rep_path, manifest)
+
+def readManifest(rep_path):
+    try:
+        with open(os.path.join(rep_path, MANIFEST), 'rb') as manifest_file:
+            return json.load(manifest_file)
+    except IOError:
+        return {}
+
+def writeManifest(rep_path, manifest):
+    with open(os.path.join(rep_path, MANIFEST), 'wb') as manifest_file:
+        json.dump(manifest, manifest_file, indent=1, sort_keys=True)
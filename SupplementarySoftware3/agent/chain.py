@@ -1,17 +1,32 @@
 import numpy as np
 import os
+import sys
 import csv
-import subprocess
 import time
 import shutil
 import psutil
+import subprocess
 from itertools import combinations
+from logreader import readLastLine, PhenotypeLog
+from runstate import RunState, splitRep, repDir
+from leases import LeaseStore, workerName
+from assets import AssetStore
+from plan import ExperimentPlan, RepQueue, DurationEstimates
+from concurrency import slotController
+from launcher import Launcher, lowerPriority
+from telemetry import EventLog, readEvents, computeStats, printStats
+from replay import traceDurations, traceOverheads, RecordedDurations, ModelledDurations, printReplay, printSimulation
+from watchdog import Watchdog, killTree
+from compaction import completedReps, compressRep
+
+# run in the background on completed reps, see compactLogs
+COMPACTION = os.path.join(os.path.dirname(os.path.abspath(__file__)), "compaction.py")
 
 # generate single replications
 def generateRep(rep_dir, anatomy, vowels, nGenerations, fitness, nHidden, 
                 mutationRate, crossoverRate, activation, n_formants, taufactor, sigmaScaling, 
                 plusSelection, rankingSelection, parent_selection, 
-                offspring_selection, popSize, nElites, config_root, wav):
+                offspring_selection, popSize, nElites, config_root, wav, assets=None):
     
     if os.path.exists(rep_dir):
         shutil.rmtree(rep_dir)
@@ -45,20 +60,32 @@ def generateRep(rep_dir, anatomy, vowels, nGenerations, fitness, nHidden,
         for param in j_params[10:]:
             writer.writerow(param)
             
-    # copy binaries
+    # copy binaries, or link them from the shared asset store
     try:            
+        items = [("config.csv",os.path.join(rep_dir,"config.csv"))]
+        
         for binary in os.listdir(config_root):
             source = os.path.join(config_root,binary)
             
             if "anatomy" in binary: 
-                destination = os.path.join(rep_dir,"anatomy.csv")
-                shutil.copy(source, destination)
+                items.append(("anatomy.csv",source))
             else:
-                destination = os.path.join(rep_dir,binary)
-                shutil.copy(source, destination)
+                items.append((binary,source))
+        
+        if assets is not None:
+            assets.linkInto(rep_dir, items)
+        else:
+            for (name,source) in items[1:]:
+                shutil.copy(source, os.path.join(rep_dir,name))
     except OSError:
         pass
 
+# clear the outputs of a rep so it can run again from the same inputs
+def resetRep(rep_path):
+    for item in os.listdir(rep_path):
+        if item == "output.txt" or item.startswith("log"):
+            os.remove(os.path.join(rep_path, item))
+
 # scan directory for previously completed reps
 def scan(super_path, max_generations, n_replications):
     (running,finished,latest_rep_gens) = ([],[],[])
@@ -77,19 +104,14 @@ def scan(super_path, max_generations, n_replications):
                     
                     # first check for finished marker
                     try:
-                        with open(log_path, 'rb') as log_file:
-                            for line in log_file:
-                                pass
-
-                            isFinished = True if line.startswith("Finished!") else False
-                            isRunning = not isFinished
+                        line = readLastLine(log_path)
+                        
+                        isFinished = line is not None and line.startswith("Finished!")
+                        isRunning = not isFinished
                             
                     # when output.txt does not exist
                     except IOError: 
                         (isFinished,isRunning) = (False,False)
-                    # when output.txt is empty
-                    except UnboundLocalError:
-                        (isFinished,isRunning) = (False,True)
                         
                     if isFinished:
                         finished.append((set,"",rep))
@@ -102,7 +124,7 @@ def scan(super_path, max_generations, n_replications):
                 for rep in os.listdir(os.path.join(set_path,"_completed")):
                     set_completed.append((set,"_completed",rep))
                     n_completed += 1     
-            except WindowsError:
+            except OSError:
                 pass
     
             for i_rep in xrange(n_replications):
@@ -117,8 +139,9 @@ def scan(super_path, max_generations, n_replications):
     return (running,latest_rep_gens,n_completed)
 
 # try to create new generation for running replications
-def attemptNewGens(super_path, finisheds, n_chain_gen, n_formants, n_vowels): 
+def attemptNewGens(super_path, finisheds, n_chain_gen, n_formants, n_vowels, state=None, assets=None): 
     new_gens = []
+    n_moved = 0
        
     for (set_dir,inter_dir,rep_dir) in finisheds:
             
@@ -143,20 +166,10 @@ def attemptNewGens(super_path, finisheds, n_chain_gen, n_formants, n_vowels):
                     os.makedirs(follow_up_dst)
                     print " \t" + set_dir + ": " + rep_dir + "->" + rep + "." + str(next_gen)
                     
-                    # read next-gen targets                
-                    with open(os.path.join(rep_src_path, "logElitesPhenotypes.csv"), 'rb') as pheno_file:
-                        pheno_reader = csv.reader(pheno_file)
-                        
-                        for (i_line,line) in enumerate(pheno_reader):
-                            if i_line == 0:
-                                header = line[n_formants*n_vowels+1:-4*n_vowels-7]
-                                n_params = len(header) / n_vowels
-                                header = [header[i*n_params:(i+1)*n_params] for i in xrange(n_vowels)]
-                                param_names = [v[v.index("_")+1:] for v in header[0]]
-                                vowel_names = [v[0][:v[0].index("_")] for v in header]
-                                
-                        params = line[n_formants*n_vowels+1:-4*n_vowels-1]
-                        params = [params[i*n_params:(i+1)*n_params] for i in xrange(n_vowels)]
+                    # read next-gen targets from the last elite
+                    pheno_log = PhenotypeLog(os.path.join(rep_src_path, "logElitesPhenotypes.csv"), n_vowels, n_formants)
+                    vowel_names = pheno_log.schema.vowel_names
+                    params = pheno_log.schema.params(pheno_log.last())
                     
                     # read next-gen anatomy
                     if next_gen == 1:
@@ -202,21 +215,467 @@ def attemptNewGens(super_path, finisheds, n_chain_gen, n_formants, n_vowels):
                     # and queue next gen
                     rep = [set_dir, rep[3:], next_gen]
                     new_gens.append(rep)
+                    
+                    if state is not None:
+                        state.mark(set_dir, os.path.basename(follow_up_dst), "queued")
                 
                     # copy over last config files
-                    for item in ["config.csv","anatomy.csv"]:
-                        shutil.copyfile(os.path.join(rep_src_path,item), os.path.join(follow_up_dst,item))
+                    if assets is not None:
+                        assets.linkFrom(rep_src_path, follow_up_dst, ["config.csv","anatomy.csv"])
+                    else:
+                        for item in ["config.csv","anatomy.csv"]:
+                            shutil.copyfile(os.path.join(rep_src_path,item), os.path.join(follow_up_dst,item))
                 
                 # move finished rep to complete
                 rep_dst_path = os.path.join(super_path,set_dir, "_completed", rep_dir)
                 
                 if rep_src_path != rep_dst_path: 
+                    # a plain rename, otherwise move falls back to copying the whole rep
+                    if not os.path.exists(os.path.dirname(rep_dst_path)):
+                        os.makedirs(os.path.dirname(rep_dst_path))
+                        
                     shutil.move(rep_src_path, rep_dst_path)
+                    n_moved += 1
+                    
+                    if state is not None:
+                        state.mark(set_dir, rep_dir, "completed")
                     
-        except WindowsError, e:
+        except OSError:
             pass
         
-    return new_gens    
+    return (new_gens,n_moved)
+
+# a sweep that cannot complete: the reps left are abandoned or follow abandoned ones
+def stopAbandoned(events, abandoned, n_completed, n_total):
+    print "stopping: %d of %d reps completed, %d abandoned:" % (n_completed, n_total, len(abandoned))
+    for (set_dir,rep_dir) in abandoned:
+        print "\t" + set_dir + ", " + rep_dir
+
+    events.log("stopped", n_completed=n_completed, abandoned=[set_dir + "/" + rep_dir for (set_dir,rep_dir) in abandoned])
+
+# event-driven scheduler for the reps launched by this controller
+class Scheduler(object):
+    def __init__(self, super_path, state, parameters, plan, reps, n_chain_gen, n_formants, n_targets):
+        self.super_path = super_path
+        self.state = state
+        self.parameters = parameters
+        self.plan = plan
+        self.reps = reps
+        self.n_total = plan.nReps() * n_chain_gen
+        self.n_chain_gen = n_chain_gen
+        self.n_formants = n_formants
+        self.n_targets = n_targets
+        
+        self.slots = slotController(parameters)
+        self.max_processes = self.slots.slots
+        self.watch_interval = parameters.get("watchInterval", 0.5)
+        self.poll_interval = parameters.get("pollInterval", 60)
+        
+        self.launcher = Launcher(parameters.get("agentCommand"), parameters.get("java_path"),
+                                 cpus=parameters.get("cpuAffinity"))
+        self.assets = AssetStore(os.path.join(super_path, "_assets"))
+        self.events = EventLog(super_path)
+        self.watchdog = Watchdog(parameters.get("stallTimeout", 0), parameters.get("maxRetries", 3))
+        
+        # own processes: (set_dir, rep_dir) -> [process, log_path, log_stat]
+        self.processes = {}
+        # (set_dir, rep_dir) -> launch time
+        self.started = {}
+        # running reps found on disk but not started here (polled only)
+        self.foreign = []
+        # reps out of attempts, and reps whose output is still locked
+        (self.dead,self.pending) = (set(),[])
+        # completed reps whose logs are still to be compressed, and the compaction running on them
+        self.compact = parameters.get("compactLogs") == "TRUE"
+        (self.to_compact,self.compactor) = ([],None)
+        
+        self.n_completed = 0
+        self.last_scan = None
+        
+    def nFree(self):
+        return self.max_processes - len(self.processes) - len(self.foreign)
+        
+    # re-evaluate the number of slots from the load of the machine
+    def adapt(self):
+        self.max_processes = self.slots.update([process.pid for (process,_,_) in self.processes.values()])
+        self.events.slots(len(self.processes), self.max_processes, len(self.foreign))
+        
+    def queue(self, new_gens):
+        for (set_dir,replication,chain_gen) in new_gens:
+            self.events.rep("queued", set_dir, repDir(int(replication), chain_gen))
+        self.reps.push(new_gens)
+        
+    # fallback: full scan for reps this controller did not start
+    def rescan(self):
+        (runnings,latest_rep_gens,self.n_completed) = self.state.scan()
+        self.foreign = [r for r in runnings if (r[0],r[-1]) not in self.processes and (r[0],r[-1]) not in self.dead]
+        
+        (new_gens,_) = attemptNewGens(self.super_path, latest_rep_gens, self.n_chain_gen-1, self.n_formants, self.n_targets, self.state, self.assets)
+        self.queue(new_gens)
+        self.last_scan = time.time()
+        
+    def launch(self):
+        (set_dir,replication,chain_gen,set_args) = self.reps.pop()
+        
+        rep_dir = repDir(replication, chain_gen)
+        rep_path = os.path.join(self.super_path, set_dir, rep_dir)
+        log_path = os.path.join(rep_path, "output.txt")
+        
+        if set_args is not None:                
+            started = time.time()
+            generateRep(rep_path, *self.plan.repArgs(set_args), assets=self.assets)
+            self.events.rep("generated", set_dir, rep_dir, duration=time.time() - started)
+         
+        self.state.mark(set_dir, rep_dir, "running")
+        
+        print "\trunning " + set_dir + ", " + rep_dir + " ..."
+        process = self.launcher.start(rep_path)
+        
+        self.processes[(set_dir,rep_dir)] = [process, log_path, None]
+        self.started[(set_dir,rep_dir)] = time.time()
+        self.watchdog.start((set_dir,rep_dir), rep_path)
+        self.events.rep("launched", set_dir, rep_dir, pid=process.pid)
+    
+    # run that exited without finishing or was killed for stalling: back in the queue from its
+    # inputs while it has attempts left, its slot free either way
+    def retry(self, key, event, **fields):
+        del self.processes[key]
+        self.events.rep(event, key[0], key[1], runtime=time.time() - self.started.pop(key), **fields)
+        
+        if self.watchdog.fail(key):
+            try:
+                resetRep(os.path.join(self.super_path, key[0], key[1]))
+                
+                self.state.mark(key[0], key[1], "queued")
+                self.reps.push([(key[0],) + splitRep(key[1])])
+                self.events.rep("requeued", key[0], key[1], attempt=self.watchdog.failures[key] + 1)
+                return
+            # outputs still locked
+            except OSError:
+                pass
+        
+        print "\tgiving up on " + key[0] + ", " + key[1]
+        self.dead.add(key)
+        self.events.rep("abandoned", key[0], key[1], attempts=self.watchdog.failures[key])
+    
+    # start as many queued reps as there are free slots
+    def fillSlots(self):
+        self.adapt()
+        
+        while len(self.reps) and self.nFree() > 0:
+            self.launch()
+        
+        self.events.slots(len(self.processes), self.max_processes, len(self.foreign))
+    
+    # block until own reps finish or exit, falling back to scans for the others
+    def wait(self):
+        retries = self.pending
+        self.pending = []
+        
+        while True:
+            finisheds = []
+            
+            for (key,(process,log_path,log_stat)) in self.processes.items():
+                exited = process.poll() is not None
+                
+                try:
+                    stat = os.stat(log_path)
+                    stat = (stat.st_size,stat.st_mtime)
+                except OSError:
+                    stat = None
+                
+                # only read the tail when output.txt has changed
+                if exited or (stat is not None and stat != log_stat):
+                    self.processes[key][2] = stat
+                    
+                    try:
+                        line = readLastLine(log_path)
+                    except IOError:
+                        line = None
+                    
+                    if line is not None and line.startswith("Finished!"):
+                        finisheds.append(key)
+                        del self.processes[key]
+                        self.state.mark(key[0], key[1], "finished")
+                        self.watchdog.forget(key)
+                        runtime = time.time() - self.started.pop(key)
+                        self.events.rep("finished", key[0], key[1], runtime=runtime)
+                        self.reps.record(key[0], splitRep(key[1])[0], runtime)
+                        continue
+                    elif exited:
+                        print "\t" + key[0] + ", " + key[1] + " exited without finishing"
+                        self.retry(key, "exited", code=process.returncode)
+                        continue
+                
+                idle = self.watchdog.stalled(key)
+                if idle is not None:
+                    print "\t" + key[0] + ", " + key[1] + " made no progress for %d s, killed" % idle
+                    killTree(process)
+                    self.retry(key, "stalled", idle=idle, log_rate=self.watchdog.rate(key))
+            
+            self.adapt()
+            
+            if len(finisheds) or (len(self.reps) and self.nFree() > 0):
+                return finisheds + retries
+            
+            # nothing left to wait for, e.g. the last run was abandoned
+            if len(self.processes) == 0 and len(self.foreign) == 0:
+                return finisheds + retries
+
+            if len(self.foreign) and time.time() - self.last_scan >= self.poll_interval:
+                self.rescan()
+                continue
+
+            time.sleep(self.watch_interval)
+            
+            if len(retries):
+                return retries
+            
+    # queue and start next chain generation straight away
+    def complete(self, finisheds):
+        for (set_dir,rep_dir) in finisheds:
+            started = time.time()
+            (new_gens,n_moved) = attemptNewGens(self.super_path, [(set_dir,"",rep_dir)], self.n_chain_gen-1, self.n_formants, self.n_targets, self.state, self.assets)
+            
+            # output still locked by the agent, retry on next wake-up
+            if n_moved == 0 and os.path.exists(os.path.join(self.super_path, set_dir, rep_dir)):
+                self.pending.append((set_dir,rep_dir))
+            elif n_moved:
+                self.events.rep("completed", set_dir, rep_dir, duration=time.time() - started)
+                self.to_compact.append(os.path.join(self.super_path, set_dir, "_completed", rep_dir))
+            
+            self.n_completed += n_moved
+            self.queue(new_gens)
+        
+        self.compactLogs()
+    
+    # compress the logs of completed reps in a low-priority process, one batch at a time
+    def compactLogs(self, args=None):
+        if not self.compact or (self.compactor is not None and self.compactor.poll() is None):
+            return
+        
+        if args is None:
+            # within the command line limit of windows
+            (args,self.to_compact) = (self.to_compact[:200],self.to_compact[200:])
+        
+        if len(args):
+            self.compactor = subprocess.Popen([sys.executable, COMPACTION] + args)
+    
+    def run(self):
+        self.rescan()
+        self.events.log("start", mode="local", n_total=self.n_total, n_completed=self.n_completed, n_queued=len(self.reps))
+        
+        # reps completed before this start
+        self.compactLogs(["--sweep", self.super_path])
+        
+        while self.n_completed < self.n_total:
+            self.fillSlots()
+            
+            if len(self.reps) == 0 and len(self.processes) == 0 and len(self.foreign) == 0 and len(self.pending) == 0:
+                # the chains of abandoned reps cannot complete
+                if len(self.dead):
+                    stopAbandoned(self.events, sorted(self.dead), self.n_completed, self.n_total)
+                    break
+
+                print "waiting..."
+                time.sleep(self.poll_interval)
+                self.rescan()
+            else:
+                self.complete(self.wait())
+        
+        # the last batches
+        while self.compact and (len(self.to_compact) or self.compactor is not None):
+            if self.compactor is not None:
+                self.compactor.wait()
+                self.compactor = None
+            self.compactLogs()
+
+# hands reps out to workers through the lease store and queues their follow-up generations
+class Coordinator(object):
+    def __init__(self, super_path, state, leases, parameters, plan, reps, n_chain_gen, n_formants, n_targets):
+        self.super_path = super_path
+        self.state = state
+        self.leases = leases
+        self.reps = reps
+        self.n_total = plan.nReps() * n_chain_gen
+        self.n_chain_gen = n_chain_gen
+        self.n_formants = n_formants
+        self.n_targets = n_targets
+        self.watch_interval = parameters.get("watchInterval", 0.5)
+        self.assets = AssetStore(os.path.join(super_path, "_assets"))
+        self.events = EventLog(super_path)
+        
+    def run(self):
+        self.leases.setFinished(False)
+        n_completed = self.state.nCompleted()
+        self.events.log("start", mode="coordinator", n_total=self.n_total, n_completed=n_completed, n_queued=len(self.reps))
+        for (set_dir,replication,chain_gen,state) in self.leases.enqueueMany(self.reps.drain()):
+            rep_dir = repDir(int(replication), chain_gen)
+            print "\tqueued again (was " + state + "): " + set_dir + ", " + rep_dir
+            self.events.rep("reset", set_dir, rep_dir, previous=state)
+        # job id -> (set_dir, rep_dir) of the jobs out of attempts
+        dead = {}
+        
+        while n_completed < self.n_total:
+            for (job_id,set_dir,replication,chain_gen) in self.leases.done():
+                rep_dir = repDir(replication, chain_gen)
+                self.state.mark(set_dir, rep_dir, "finished")
+                
+                started = time.time()
+                (new_gens,n_moved) = attemptNewGens(self.super_path, [(set_dir,"",rep_dir)], self.n_chain_gen-1, self.n_formants, self.n_targets, self.state, self.assets)
+                
+                # otherwise output still locked, retry on next pass
+                if n_moved or not os.path.exists(os.path.join(self.super_path, set_dir, rep_dir)):
+                    if n_moved:
+                        self.events.rep("completed", set_dir, rep_dir, duration=time.time() - started)
+                    for (new_set_dir,new_replication,new_chain_gen) in new_gens:
+                        self.events.rep("queued", new_set_dir, repDir(int(new_replication), new_chain_gen))
+                    
+                    self.leases.enqueueMany((set_dir,replication,chain_gen,None) for (set_dir,replication,chain_gen) in new_gens)
+                    self.leases.close(job_id)
+            
+            for (job_id,set_dir,replication,chain_gen,attempts) in self.leases.failed():
+                if job_id not in dead:
+                    dead[job_id] = (set_dir,repDir(replication, chain_gen))
+                    print "\tgiving up on " + set_dir + ", " + dead[job_id][1]
+                    self.events.rep("abandoned", set_dir, dead[job_id][1], attempts=attempts)
+            
+            n_completed = self.state.nCompleted()
+            counts = self.leases.counts()
+            
+            # the chains of abandoned reps cannot complete, and the workers are let go
+            if len(dead) and not any(counts.get(state) for state in ("queued","leased","done")):
+                stopAbandoned(self.events, sorted(dead.values()), n_completed, self.n_total)
+                break
+            
+            time.sleep(self.watch_interval)
+            
+        self.leases.setFinished()
+
+# claims reps from the lease store and runs them on this machine
+class Worker(object):
+    def __init__(self, super_path, leases, parameters):
+        self.super_path = super_path
+        self.leases = leases
+        self.name = workerName()
+        self.base_rep = baseRep(parameters)
+        
+        self.slots = slotController(parameters)
+        self.watch_interval = parameters.get("watchInterval", 0.5)
+        self.lease_time = parameters.get("leaseTime", 300)
+        self.launcher = Launcher(parameters.get("agentCommand"), parameters.get("java_path"),
+                                 cpus=parameters.get("cpuAffinity"))
+        self.assets = AssetStore(os.path.join(super_path, "_assets"))
+        self.events = EventLog(super_path, self.name)
+        # retries are counted by the lease store
+        self.watchdog = Watchdog(parameters.get("stallTimeout", 0))
+        
+        # job id -> (process, rep_path)
+        self.jobs = {}
+        # job id -> (set_dir, rep_dir, launch time)
+        self.started = {}
+        self.last_heartbeat = time.time()
+        
+    def start(self, job):
+        (job_id,set_dir,replication,chain_gen,set_args) = job
+        rep_dir = repDir(replication, chain_gen)
+        rep_path = os.path.join(self.super_path, set_dir, rep_dir)
+        
+        # first generations are generated here, follow-ups by the coordinator
+        if set_args is not None:
+            started = time.time()
+            generateRep(rep_path, *(set_args + self.base_rep), assets=self.assets)
+            self.events.rep("generated", set_dir, rep_dir, duration=time.time() - started, worker=self.name)
+        else:
+            resetRep(rep_path)
+        
+        print "\trunning " + set_dir + ", " + rep_dir + " ..."
+        process = self.launcher.start(rep_path)
+        
+        self.jobs[job_id] = (process,rep_path)
+        self.started[job_id] = (set_dir,rep_dir,time.time())
+        self.watchdog.start(job_id, rep_path)
+        self.events.rep("launched", set_dir, rep_dir, pid=process.pid, worker=self.name)
+        
+    def run(self):
+        print "worker " + self.name
+        
+        while True:
+            max_processes = self.slots.update([process.pid for (process,_) in self.jobs.values()])
+            self.events.slots(len(self.jobs), max_processes)
+            
+            while len(self.jobs) < max_processes:
+                job = self.leases.claim(self.name, self.lease_time)
+                
+                if job is None:
+                    break
+                self.start(job)
+            
+            for (job_id,(process,rep_path)) in self.jobs.items():
+                # stalled runs fail like crashed ones
+                idle = self.watchdog.stalled(job_id)
+                if idle is not None:
+                    print "\t" + rep_path + " made no progress for %d s, killed" % idle
+                    killTree(process)
+                
+                if process.poll() is not None:
+                    try:
+                        line = readLastLine(os.path.join(rep_path, "output.txt"))
+                    except IOError:
+                        line = None
+                    
+                    finished = line is not None and line.startswith("Finished!")
+                    self.leases.report(job_id, self.name, finished)
+                    del self.jobs[job_id]
+                    
+                    (set_dir,rep_dir,started) = self.started.pop(job_id)
+                    fields = {"runtime": time.time() - started, "worker": self.name}
+                    
+                    # one event per run, a killed run counting as stalled rather than exited
+                    if idle is not None and not finished:
+                        self.events.rep("stalled", set_dir, rep_dir, idle=idle, log_rate=self.watchdog.rate(job_id), **fields)
+                    else:
+                        self.events.rep("finished" if finished else "exited", set_dir, rep_dir, **fields)
+                    self.watchdog.forget(job_id)
+            
+            if time.time() - self.last_heartbeat >= self.lease_time / 3.0:
+                for (job_id,(process,rep_path)) in self.jobs.items():
+                    # lease expired and taken over elsewhere
+                    if not self.leases.heartbeat(job_id, self.name, self.lease_time):
+                        print "\tlost lease on " + rep_path
+                        process.kill()
+                        del self.jobs[job_id]
+                        del self.started[job_id]
+                        self.watchdog.forget(job_id)
+                        
+                self.last_heartbeat = time.time()
+            
+            if len(self.jobs) == 0 and self.leases.isFinished():
+                break
+                
+            time.sleep(self.watch_interval)
+
+# generateRep arguments shared by all reps of a sweep
+def baseRep(parameters):
+    return [parameters["nIterations"], parameters["fitness"], parameters["nHidden"], 
+    parameters["mutationRate"], parameters["crossoverRate"], parameters["activation"],
+    parameters["nFormants"], parameters["tauFactor"], parameters["sigmaScaling"], 
+    parameters["plusSelection"], parameters["rankingSelection"], parameters["parentSelection"], 
+    parameters["offspringSelection"], parameters["popSize"], parameters["nElites"], parameters["config_root"],
+    parameters["wav"]]
+
+# sets x replications of the sweep in the config
+def makePlan(parameters):
+    # set vowels
+    #'i','I','y','Y','e','E','oe','OE','ae','u','U','o','O','a','i-','schwa','er','r'
+    vowels = [list(v) for v in (combinations(parameters["targets"], parameters["nTargets"]))]
+    
+    # read anatomy file
+    with open(os.path.join(parameters["config_root"], "anatomy.csv")) as target_file:
+        reader = csv.reader(target_file)
+        anatomies = [line[0].replace(" ", "_") for line in reader][2:]
+    
+    return ExperimentPlan(anatomies, parameters["iAnatomies"], vowels, parameters["nReplications"], baseRep(parameters))
 
 # read global config file
 def readConfig():
@@ -258,113 +717,120 @@ def readConfig():
 if __name__ == "__main__":
     # set priority to low
     proc = psutil.Process(os.getpid())
-    proc.nice(psutil.IDLE_PRIORITY_CLASS)
-    prio = "low"
+    lowerPriority(proc)
     
     # read and set parameters
     parameters = readConfig()
     
-    config_root = parameters["config_root"]
-    nGenerations = parameters["nIterations"]
     n_formants = parameters["nFormants"]
-    super_path = os.path.join(parameters["data_root"], str(parameters["expLabel"]))
-
-    base_rep = [nGenerations, parameters["fitness"], parameters["nHidden"], 
-    parameters["mutationRate"], parameters["crossoverRate"], parameters["activation"],
-    n_formants, parameters["tauFactor"], parameters["sigmaScaling"], 
-    parameters["plusSelection"], parameters["rankingSelection"], parameters["parentSelection"], 
-    parameters["offspringSelection"], parameters["popSize"], parameters["nElites"], config_root,
-    parameters["wav"]]
+    super_path = os.path.join(parameters["data_root"], str(parameters["expLabel"]))
     
-    # set vowels
-    #'i','I','y','Y','e','E','oe','OE','ae','u','U','o','O','a','i-','schwa','er','r'
-    n_targets = parameters["nTargets"]
-    vowels = [list(v) for v in (combinations(parameters["targets"], n_targets))]
+    # "chain.py coordinator" / "chain.py worker" split a sweep over several machines
+    mode = sys.argv[1] if len(sys.argv) > 1 and not sys.argv[1].startswith("--") else "local"
     
-    # read anatomy file
-    with open(os.path.join(config_root, "anatomy.csv")) as target_file:
-        reader = csv.reader(target_file)
-        anatomies = [line[0].replace(" ", "_") for line in reader][2:]
+    # "chain.py stats": throughput, runtimes and slot use from the event log of the sweep
+    if mode == "stats":
+        n_total = makePlan(parameters).nReps() * parameters["nChainGen"]
+        n_completed = RunState(super_path).nCompleted() if os.path.exists(super_path) else 0
+        
+        printStats(computeStats(readEvents(super_path), n_total, n_completed))
+        sys.exit()
+    
+    # "chain.py compact": compress the logs of all completed reps now, e.g. of a sweep run before compaction
+    if mode == "compact":
+        saved = sum(compressRep(rep_path) for rep_path in completedReps(super_path))
+        
+        print "%.1f MB saved" % (saved / 1048576.0)
+        sys.exit()
+    
+    # "chain.py replay [slots]": queue orders compared on the runtimes logged so far
+    if mode == "replay":
+        n_slots = int(sys.argv[2]) if len(sys.argv) > 2 else parameters["maxProcesses"]
+        
+        printReplay(makePlan(parameters), parameters["nChainGen"], traceDurations(readEvents(super_path)), n_slots)
+        sys.exit()
+    
+    # "chain.py simulate [--slots 4,8] [--order depth,critical] [--watch 0.5,5] [--runtime S [--spread CV]]":
+    # the sweep of the config in virtual time for each combination of settings, on the runtimes and controller
+    # overheads logged so far, or on modelled runtimes of S seconds on average
+    if mode == "simulate":
+        def option(name, default, parse=float):
+            if name not in sys.argv:
+                return default
+            return [parse(value) for value in sys.argv[sys.argv.index(name) + 1].split(",")]
+        
+        events = readEvents(super_path)
+        n_chain_gen = parameters["nChainGen"]
+        
+        if "--runtime" in sys.argv:
+            runtime = ModelledDurations(option("--runtime", None)[0], option("--spread", [0.0])[0])
+        elif len(traceDurations(events)):
+            runtime = RecordedDurations(traceDurations(events), n_chain_gen)
+        else:
+            print "no runtimes logged for " + super_path + " yet, model them with --runtime"
+            sys.exit(1)
+        
+        printSimulation(makePlan(parameters), n_chain_gen, runtime, option("--slots", [parameters["maxProcesses"]], int),
+                        option("--order", [parameters.get("queueOrder", "depth")], str),
+                        option("--watch", [parameters.get("watchInterval", 0.5)]), *traceOverheads(events))
+        sys.exit()
+    
+    if mode in ("coordinator","worker"):
+        if not os.path.exists(super_path):
+            os.makedirs(super_path)
+            
+        lease_path = parameters.get("leaseStore") or os.path.join(super_path, "_leases.sqlite")
+        leases = LeaseStore(lease_path, parameters.get("maxRetries", 3))
     
+    if mode == "worker":
+        Worker(super_path, leases, parameters).run()
+        sys.exit()
+
     # init
-    n_replications = parameters["nReplications"]
-    i_anatomies = parameters["iAnatomies"]
+    n_targets = parameters["nTargets"]
     n_chain_gen = parameters["nChainGen"]
     
+    plan = makePlan(parameters)
+    follow_ups = []
+    
     # if new run
     if(not os.path.exists(super_path)):
         os.makedirs(super_path)
-        n_completed = 0
-    # if continuing from previous run  
+        state = RunState(super_path)
+    # if continuing from previous run, from the run-state index (rebuilt from the tree if missing)
     else:             
+        state = RunState(super_path, rebuild="--rebuild" in sys.argv)
+        
         # remove unfinisheds, transfer finished earliers
-        (unfinisheds,latest_rep_gens,n_completed) = scan(super_path, nGenerations, n_replications)
+        (unfinisheds,latest_rep_gens,n_completed) = state.scan()
         
         for unfinished in unfinisheds:
-            shutil.rmtree(os.path.join(super_path, *unfinished))   
-                   
-    # generate initials sets/reps (but exclude already finished before)
-    reps = []   
-    
-    for i_anatomy in i_anatomies:
-        for vowel_subset in vowels:
-            set_dir = anatomies[i_anatomy] + "."
-            
-            for vowel in vowel_subset:
-                set_dir += vowel + "_"
-                
-            set_dir = set_dir[:-1]
-            
-            for i_rep in xrange(n_replications):                       
-                # only add if not computed before   
-                already_computed = False
-                
-                try:
-                    for item in latest_rep_gens:
-                        (f_set_dir,f_i_rep) = (item[0],item[-1]) 
-                        
-                        if f_set_dir == set_dir and int(f_i_rep.split(".")[0][3:]) == i_rep:
-                            already_computed = True
-                            break
-                # if first init
-                except NameError:
-                    pass
+            # still being run by a worker
+            if mode == "coordinator" and leases.isLeased(unfinished[0], *splitRep(unfinished[-1])):
+                continue
                 
-                if not already_computed:
-                    rep = [set_dir, i_rep, 0, i_anatomy, vowel_subset] + base_rep
-                    reps.append(rep)             
-      
-    # keep try running new reps
-    n_reps = len(vowels) * len(i_anatomies) * n_replications
-    
-    while n_completed < n_reps * n_chain_gen:               
-        (runnings,latest_rep_gens,n_completed) = scan(super_path, nGenerations, n_replications)
+            shutil.rmtree(os.path.join(super_path, *unfinished))   
+            state.forget(unfinished[0], unfinished[-1])
         
-        new_reps = attemptNewGens(super_path, latest_rep_gens, n_chain_gen-1, n_formants, n_targets)     
+        # exclude chains started before
+        plan.markComputed(latest_rep_gens)
         
-        reps += new_reps
-        reps = sorted(reps, key=lambda x: (-x[2], int(x[1])))
-            
-        # run reps if slots are available
-        if len(reps) and len(runnings) < parameters["maxProcesses"]:            
-            rep = reps[0]
-            set_dir = str(rep[0])
-            rep_dir = "rep" + str(rep[1]) + "." + str(rep[2])
-            
-            set_path = os.path.join(super_path, set_dir)
-            rep_path = os.path.join(set_path, rep_dir)
-            
-            if len(rep) > 3:                
-                generateRep(rep_path, *rep[3:])
-             
-            # submit command            
-            command = "start /" + prio + " /b java -jar " + "Agent.jar " + rep_path + "\ >> " + os.path.join(rep_path,"output.txt")
-            print "\trunning " + set_dir + ", " + rep_dir + " ..."
-            subprocess.Popen(command, env={'PATH': parameters["java_path"]}, shell=True)
-            
-            # if resuming, remove preceding gen from queue 
-            reps = reps[1:]            
-            time.sleep(1)
-        else:
-            print "waiting..."
-            time.sleep(60)
\ No newline at end of file
+        # follow-up generations that were created but never launched
+        follow_ups = [(set_dir,i_rep,chain_gen) for (set_dir,i_rep,chain_gen) in state.queued() if chain_gen > 0]
+    
+    # "critical": chains with the most work left first, estimated from the runtimes logged so far
+    estimates = None
+    if parameters.get("queueOrder") == "critical":
+        estimates = DurationEstimates(n_chain_gen)
+        estimates.recordEvents(readEvents(super_path))
+    
+    # initial sets/reps are drawn from the plan as slots free up
+    reps = RepQueue(plan, estimates)
+    reps.push(follow_ups)
+    
+    # keep running new reps, reacting to each finished one right away
+    if mode == "coordinator":
+        scheduler = Coordinator(super_path, state, leases, parameters, plan, reps, n_chain_gen, n_formants, n_targets)
+    else:
+        scheduler = Scheduler(super_path, state, parameters, plan, reps, n_chain_gen, n_formants, n_targets)
+    scheduler.run()
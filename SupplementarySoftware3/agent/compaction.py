@@ -0,0 +1,93 @@
+import os
+import sys
+import zlib
+import struct
+import psutil
+from logreader import COMPRESSED, MEMBER_HEADER
+from launcher import lowerPriority
+from fileutil import replaceFile
+
+# logs of a completed rep that are compacted, the bulk of a sweep on disk
+LOGS = ["logPopulation.csv","logElitesGenotypes.csv","logElitesPhenotypes.csv"]
+BLOCK_SIZE = 1 << 16
+
+# one gzip member in the layout logreader expects
+def compressMember(data, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    deflated = compressor.compress(data) + compressor.flush()
+
+    n_lines = data.count("\n") + (len(data) > 0 and data[-1] != "\n")
+    size = MEMBER_HEADER.size + len(deflated) + 8
+
+    # FEXTRA flag, no mtime, os unknown; 8 bytes of "HP" subfield
+    header = MEMBER_HEADER.pack(0x1f, 0x8b, 8, 4, 0, 0, 255, 12, "H", "P", 8, size, n_lines)
+    return header + deflated + struct.pack("<II", zlib.crc32(data) & 0xffffffff, len(data) & 0xffffffff)
+
+# <log>.gz in members of whole lines of about block_size bytes, the plain log removed once its copy is in
+# place; returns the bytes saved
+def compressLog(log_path, block_size=BLOCK_SIZE, level=6):
+    if not os.path.exists(log_path):
+        return 0
+
+    (compressed_path,n_members) = (log_path + COMPRESSED,0)
+
+    with open(log_path, 'rb') as log_file, open(compressed_path + ".tmp", 'wb') as compressed_file:
+        rest = ""
+
+        for block in iter(lambda: log_file.read(block_size), ""):
+            block = rest + block
+            i_end = block.rfind("\n") + 1
+
+            # lines longer than a block go whole into a larger member
+            if i_end:
+                compressed_file.write(compressMember(block[:i_end], level))
+                n_members += 1
+            rest = block[i_end:]
+
+        # the last line without its line end, and empty logs
+        if rest or n_members == 0:
+            compressed_file.write(compressMember(rest, level))
+
+    replaceFile(compressed_path + ".tmp", compressed_path)
+
+    saved = os.path.getsize(log_path) - os.path.getsize(compressed_path)
+
+    # still open in a reader (windows): the plain log keeps being used until the next pass
+    try:
+        os.remove(log_path)
+    except OSError:
+        return 0
+
+    return saved
+
+def compressRep(rep_path):
+    return sum(compressLog(os.path.join(rep_path, name)) for name in LOGS)
+
+# completed reps of a sweep
+def completedReps(super_path):
+    for set_dir in sorted(os.listdir(super_path)):
+        completed_path = os.path.join(super_path, set_dir, "_completed")
+
+        if set_dir[0] != "_" and os.path.isdir(completed_path):
+            for rep_dir in sorted(os.listdir(completed_path)):
+                yield os.path.join(completed_path, rep_dir)
+
+# compaction.py <rep_path>... / compaction.py --sweep <super_path>: run by chain.py in the background
+if __name__ == "__main__":
+    lowerPriority(psutil.Process(os.getpid()))
+
+    if sys.argv[1] == "--sweep":
+        rep_paths = completedReps(sys.argv[2])
+    else:
+        rep_paths = sys.argv[1:]
+
+    (n_reps,saved) = (0,0)
+    for rep_path in rep_paths:
+        try:
+            saved += compressRep(rep_path)
+            n_reps += 1
+        # rep moved or removed meanwhile
+        except (IOError,OSError):
+            pass
+
+    print "compacted %d reps, %.1f MB saved" % (n_reps, saved / 1048576.0)
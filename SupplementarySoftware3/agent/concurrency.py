@@ -0,0 +1,99 @@
+import os
+import time
+import psutil
+
+MB = 1024 * 1024
+
+def loadAverage():
+    try:
+        return os.getloadavg()[0]
+    # windows: psutil emulates it from the processor queue
+    except (AttributeError,OSError):
+        return psutil.getloadavg()[0]
+
+# resident memory of the agents launched here, their own children included
+def agentsRss(pids):
+    rss = 0
+
+    for pid in pids:
+        try:
+            process = psutil.Process(pid)
+            for member in [process] + process.children(recursive=True):
+                rss += member.memory_info().rss
+        except psutil.Error:
+            pass
+
+    return rss
+
+# number of concurrent agent runs, adapted within [min_slots, max_slots] to the load of the machine:
+# raised by up to max_step per interval while whole cores are idle and memory allows more agents,
+# lowered when the machine is oversubscribed or memory runs short
+class SlotController(object):
+    def __init__(self, min_slots, max_slots, load_target=1.25, mem_reserve=1024, interval=30, agent_mem=1024, max_step=1):
+        (self.min_slots,self.max_slots) = (min_slots,max_slots)
+        self.slots = min_slots
+        self.load_target = load_target
+        self.mem_reserve = mem_reserve * MB
+        self.interval = interval
+        self.max_step = max_step
+
+        self.n_cpus = psutil.cpu_count() or 1
+        # largest agent seen so far, to guess what one more would take; the configured estimate until then
+        (self.agent_rss,self.agent_mem) = (0,agent_mem * MB)
+        self.last_update = None
+        psutil.cpu_percent(interval=None)
+
+    def sample(self, pids):
+        rss = agentsRss(pids)
+
+        if len(pids):
+            self.agent_rss = max(self.agent_rss, rss / len(pids))
+
+        return {"cpu": psutil.cpu_percent(interval=None), "load": loadAverage() / self.n_cpus,
+                "available": psutil.virtual_memory().available, "agents_rss": rss}
+
+    def decide(self, metrics, n_running):
+        (available,per_agent) = (metrics["available"],self.agent_rss or self.agent_mem)
+
+        if available < self.mem_reserve:
+            n_over = int((self.mem_reserve - available) / per_agent) + 1
+            return max(self.min_slots, min(self.slots, n_running - n_over))
+        elif metrics["load"] > self.load_target:
+            return max(self.min_slots, self.slots - 1)
+
+        idle_cpus = int(self.n_cpus * (100 - metrics["cpu"]) / 100)
+        room = int((available - self.mem_reserve) / per_agent)
+        return min(self.max_slots, self.slots + max(0, min(idle_cpus, room, self.max_step)))
+
+    # current number of slots, re-evaluated every interval seconds
+    def update(self, pids):
+        if self.last_update is not None and time.time() - self.last_update < self.interval:
+            return self.slots
+
+        self.last_update = time.time()
+        metrics = self.sample(pids)
+        slots = self.decide(metrics, len(pids))
+
+        if slots != self.slots:
+            print "slots: %d -> %d (cpu %.0f%%, load %.2f/cpu, %d MB available, agents %d MB)" % \
+                (self.slots, slots, metrics["cpu"], metrics["load"], metrics["available"] / MB, metrics["agents_rss"] / MB)
+            self.slots = slots
+
+        return self.slots
+
+# fixed ceiling, as set by maxProcesses
+class FixedSlots(object):
+    def __init__(self, slots):
+        self.slots = slots
+
+    def update(self, pids):
+        return self.slots
+
+def slotController(parameters):
+    if parameters.get("adaptiveSlots") != "TRUE":
+        return FixedSlots(parameters["maxProcesses"])
+
+    return SlotController(parameters.get("minProcesses", 1), parameters["maxProcesses"],
+                          parameters.get("loadTarget", 1.25), parameters.get("memReserveMB", 1024),
+                          parameters.get("slotInterval", 30), parameters.get("agentMemMB", 1024),
+                          parameters.get("slotStep", 1))
@@ -0,0 +1,7 @@
+import os
+
+# rename over an existing file, which windows does not do by itself; used to put finished files in place
+def replaceFile(source, destination):
+    if os.path.exists(destination):
+        os.remove(destination)
+    os.rename(source, destination)
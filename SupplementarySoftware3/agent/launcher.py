@@ -0,0 +1,87 @@
+import os
+import shlex
+import subprocess
+import psutil
+
+# {rep_path} is replaced by the rep directory (with trailing separator, as Agent.jar expects)
+DEFAULT_COMMAND = "java -jar Agent.jar {rep_path}"
+
+# not exposed by subprocess on python 2
+IDLE_PRIORITY_CLASS = 0x00000040
+
+def lowerPriority(process):
+    if os.name == "nt":
+        process.nice(psutil.IDLE_PRIORITY_CLASS)
+    else:
+        process.nice(19)
+
+# starts agent runs directly (no shell), output.txt redirected here. the command is a string split as
+# the shell would (quote paths with spaces), or a list of arguments, one per cell of agentCommand in config.csv
+class Launcher(object):
+    def __init__(self, command=None, java_path=None, low_priority=True, cpus=None):
+        if isinstance(command, list):
+            self.args = [str(arg) for arg in command]
+        else:
+            self.args = shlex.split(str(command or DEFAULT_COMMAND), posix=(os.name != "nt"))
+        self.java_path = java_path
+        self.low_priority = low_priority
+
+        # cpus to spread the agents over, one agent per cpu where possible
+        if cpus is not None and not isinstance(cpus, list):
+            cpus = [cpus]
+        self.cpus = cpus
+        self.pinned = {}
+
+        self.env = os.environ.copy()
+        if java_path:
+            self.env["PATH"] = java_path + os.pathsep + self.env.get("PATH", "")
+
+    # resolve the executable ourselves, windows only searches the parent's PATH
+    def executable(self, name):
+        if os.path.dirname(name):
+            return name
+
+        for path in self.env["PATH"].split(os.pathsep):
+            for candidate in (name, name + ".exe"):
+                candidate = os.path.join(path, candidate)
+
+                if os.path.isfile(candidate) and os.access(candidate, os.X_OK):
+                    return candidate
+        return name
+
+    def pickCpu(self):
+        for pid in self.pinned.keys():
+            if not psutil.pid_exists(pid):
+                del self.pinned[pid]
+
+        load = dict((cpu, 0) for cpu in self.cpus)
+        for cpu in self.pinned.values():
+            load[cpu] += 1
+
+        return min(self.cpus, key=lambda cpu: (load[cpu], cpu))
+
+    def start(self, rep_path, log_name="output.txt"):
+        args = [arg.replace("{rep_path}", os.path.join(rep_path, "")) for arg in self.args]
+        args[0] = self.executable(args[0])
+
+        creation_flags = IDLE_PRIORITY_CLASS if os.name == "nt" and self.low_priority else 0
+
+        with open(os.path.join(rep_path, log_name), 'ab') as log_file:
+            process = subprocess.Popen(args, stdout=log_file, stderr=subprocess.STDOUT, env=self.env,
+                                       creationflags=creation_flags)
+
+        try:
+            agent = psutil.Process(process.pid)
+
+            if os.name != "nt" and self.low_priority:
+                lowerPriority(agent)
+
+            if self.cpus:
+                cpu = self.pickCpu()
+                agent.cpu_affinity([cpu])
+                self.pinned[process.pid] = cpu
+        # agent already gone, or affinity not supported here / invalid cpu
+        except (psutil.Error,AttributeError,ValueError):
+            pass
+
+        return process
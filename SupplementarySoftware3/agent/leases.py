@@ -0,0 +1,124 @@
+import os
+import json
+import socket
+import sqlite3
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (id INTEGER PRIMARY KEY, set_dir TEXT, replication INTEGER, chain_gen INTEGER,
+                                 set_args TEXT, state TEXT, worker TEXT, expires REAL, attempts INTEGER DEFAULT 0,
+                                 UNIQUE (set_dir, replication, chain_gen));
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+def workerName():
+    return socket.gethostname() + ":" + str(os.getpid())
+
+# queue of reps shared by a coordinator and its workers; a job is
+# queued -> leased (renewed by heartbeats) -> done -> closed,
+# and goes back to queued when its lease expires or its run fails
+class LeaseStore(object):
+    def __init__(self, db_path, max_retries=3):
+        self.max_retries = max_retries
+        self.db = sqlite3.connect(db_path, timeout=60, isolation_level=None)
+        self.db.executescript(SCHEMA)
+
+    # short write transaction, taken before reading so claims cannot race
+    def transaction(self, query, args=()):
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            result = query(args)
+            self.db.execute("COMMIT")
+        except:
+            self.db.execute("ROLLBACK")
+            raise
+        return result
+
+    # a rep queued again by the run index (reset on disk before a restart) was closed or failed here:
+    # its job goes back to the queue with its attempts cleared. returns the state it was reset from, if any
+    def enqueue(self, set_dir, replication, chain_gen, set_args=None):
+        key = (set_dir, int(replication), chain_gen)
+        set_args = json.dumps(set_args) if set_args is not None else None
+
+        cursor = self.db.execute("INSERT OR IGNORE INTO jobs (set_dir, replication, chain_gen, set_args, state) VALUES (?,?,?,?,'queued')",
+                                 key + (set_args,))
+        if cursor.rowcount == 1:
+            return None
+
+        (state,) = self.db.execute("SELECT state FROM jobs WHERE set_dir=? AND replication=? AND chain_gen=?", key).fetchone()
+        if state not in ("closed","failed"):
+            return None
+
+        self.db.execute("""UPDATE jobs SET state='queued', worker=NULL, expires=NULL, attempts=0, set_args=?
+                           WHERE set_dir=? AND replication=? AND chain_gen=?""", (set_args,) + key)
+        return state
+
+    # (set_dir, replication, chain_gen, set_args) entries of the rep queue; returns the
+    # (set_dir, replication, chain_gen, state) of the jobs reset by enqueue
+    def enqueueMany(self, reps):
+        def query(reps):
+            resets = []
+            for (set_dir,replication,chain_gen,set_args) in reps:
+                state = self.enqueue(set_dir, replication, chain_gen, set_args)
+                if state is not None:
+                    resets.append((set_dir,replication,chain_gen,state))
+            return resets
+        return self.transaction(query, reps)
+
+    # same order as the local queue: deepest chain generation first
+    def claim(self, worker, lease_time):
+        def query(args):
+            now = time.time()
+            self.db.execute("UPDATE jobs SET state='queued', worker=NULL WHERE state='leased' AND expires<?", (now,))
+
+            row = self.db.execute("""SELECT id, set_dir, replication, chain_gen, set_args FROM jobs
+                                     WHERE state='queued' ORDER BY chain_gen DESC, replication, id LIMIT 1""").fetchone()
+            if row is None:
+                return None
+
+            self.db.execute("UPDATE jobs SET state='leased', worker=?, expires=?, attempts=attempts+1 WHERE id=?",
+                            (worker, now + lease_time, row[0]))
+
+            (job_id,set_dir,replication,chain_gen,set_args) = row
+            return (job_id,set_dir,replication,chain_gen,json.loads(set_args) if set_args is not None else None)
+        return self.transaction(query)
+
+    # extend the lease; False if it expired and was claimed by someone else
+    def heartbeat(self, job_id, worker, lease_time):
+        cursor = self.db.execute("UPDATE jobs SET expires=? WHERE id=? AND worker=? AND state='leased'",
+                                 (time.time() + lease_time, job_id, worker))
+        return cursor.rowcount == 1
+
+    def report(self, job_id, worker, finished):
+        if finished:
+            self.db.execute("UPDATE jobs SET state='done' WHERE id=? AND worker=?", (job_id, worker))
+        else:
+            self.db.execute("""UPDATE jobs SET state=CASE WHEN attempts<? THEN 'queued' ELSE 'failed' END, worker=NULL
+                               WHERE id=? AND worker=?""", (self.max_retries, job_id, worker))
+
+    # finished runs the coordinator has not handled yet
+    def done(self):
+        return self.db.execute("SELECT id, set_dir, replication, chain_gen FROM jobs WHERE state='done'").fetchall()
+
+    # runs out of attempts
+    def failed(self):
+        return self.db.execute("SELECT id, set_dir, replication, chain_gen, attempts FROM jobs WHERE state='failed'").fetchall()
+
+    def close(self, job_id):
+        self.db.execute("UPDATE jobs SET state='closed' WHERE id=?", (job_id,))
+
+    def isLeased(self, set_dir, replication, chain_gen):
+        row = self.db.execute("SELECT 1 FROM jobs WHERE set_dir=? AND replication=? AND chain_gen=? AND state='leased' AND expires>=?",
+                              (set_dir, replication, chain_gen, time.time())).fetchone()
+        return row is not None
+
+    def counts(self):
+        return dict(self.db.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall())
+
+    def setFinished(self, finished=True):
+        self.db.execute("INSERT OR REPLACE INTO meta VALUES ('finished', ?)", ("1" if finished else "0",))
+
+    def isFinished(self):
+        row = self.db.execute("SELECT value FROM meta WHERE key='finished'").fetchone()
+        return row is not None and row[0] == "1"
@@ -0,0 +1,290 @@
+import os
+import csv
+import zlib
+import struct
+import numpy as np
+
+N_VAR_NISHIMURAS = 4
+N_GLOBAL_NISHIMURAS = 6
+
+# compacted logs (see compaction.py) are stored as <log>.gz: gzip members of whole lines, so gzip reads them too,
+# each with an "HP" extra field holding the size of the member and its number of lines; members are found by
+# hopping from header to header, and lines counted, without decompressing anything
+COMPRESSED = ".gz"
+# id1, id2, method, flags, mtime, extra flags, os, extra length, subfield id, subfield length, member size, lines
+MEMBER_HEADER = struct.Struct("<BBBBIBBHccHII")
+
+# the plain log while there is one, its compressed copy otherwise
+def resolveLog(log_path):
+    if not os.path.exists(log_path) and os.path.exists(log_path + COMPRESSED):
+        return log_path + COMPRESSED
+    return log_path
+
+# (offset, size, n_lines) of the members of a compressed log
+def readMembers(log_file):
+    (members,offset) = ([],0)
+
+    while True:
+        log_file.seek(offset)
+        header = log_file.read(MEMBER_HEADER.size)
+        if len(header) < MEMBER_HEADER.size:
+            return members
+
+        fields = MEMBER_HEADER.unpack(header)
+        if fields[:2] != (0x1f,0x8b) or fields[8:10] != ("H","P"):
+            raise IOError("not a compacted log: " + log_file.name)
+
+        (size,n_lines) = fields[-2:]
+        members.append((offset,size,n_lines))
+        offset += size
+
+def readMember(log_file, member):
+    (offset,size,_) = member
+    log_file.seek(offset)
+
+    # raw deflate stream between the header and the crc32/size trailer
+    return zlib.decompress(log_file.read(size)[MEMBER_HEADER.size:-8], -zlib.MAX_WBITS)
+
+# a compressed log read forwards like a file, one member at a time
+class CompressedLog(object):
+    def __init__(self, log_path):
+        self.log_file = open(log_path, 'rb')
+        self.name = log_path
+        self.lines = self.iterLines()
+
+    def iterLines(self):
+        for member in readMembers(self.log_file):
+            lines = readMember(self.log_file, member).split("\n")
+
+            for line in lines[:-1]:
+                yield line + "\n"
+            if lines[-1]:
+                yield lines[-1]
+
+    def __iter__(self):
+        return self.lines
+
+    def next(self):
+        return self.lines.next()
+
+    def readline(self):
+        return next(self.lines, "")
+
+    def close(self):
+        self.log_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+# plain or compressed log, opened for reading forwards
+def openLog(log_path):
+    log_path = resolveLog(log_path)
+    return CompressedLog(log_path) if log_path.endswith(COMPRESSED) else open(log_path, 'rb')
+
+# blocks of a log from its end backwards: block_size bytes at a time, or member by member when compressed
+def reversedBlocks(log_path, block_size):
+    log_path = resolveLog(log_path)
+
+    with open(log_path, 'rb') as log_file:
+        if log_path.endswith(COMPRESSED):
+            for member in reversed(readMembers(log_file)):
+                yield readMember(log_file, member)
+            return
+
+        log_file.seek(0, os.SEEK_END)
+        position = log_file.tell()
+
+        while position > 0:
+            step = min(block_size, position)
+            position -= step
+            log_file.seek(position)
+            yield log_file.read(step)
+
+# lines of a log from the last one backwards, reading blocks from the end of the file
+def iterReversedLines(log_path, block_size=8192):
+    rest = ""
+
+    for block in reversedBlocks(log_path, block_size):
+        lines = (block + rest).split("\n")
+
+        # first piece may be cut, keep it for the next block
+        rest = lines[0]
+        for line in reversed(lines[1:]):
+            line = line.rstrip("\r")
+            if line:
+                yield line
+
+    rest = rest.rstrip("\r")
+    if rest:
+        yield rest
+
+# read last line of a log without reading the whole file
+def readLastLine(log_path, block_size=1024):
+    for line in iterReversedLines(log_path, block_size):
+        return line
+    return None
+
+# number of lines, counted in blocks of bytes (from the member headers when compressed)
+def countLines(log_path, block_size=1 << 20):
+    (n_lines,last) = (0,"\n")
+    log_path = resolveLog(log_path)
+    
+    if log_path.endswith(COMPRESSED):
+        with open(log_path, 'rb') as log_file:
+            return sum(n_lines for (_,_,n_lines) in readMembers(log_file))
+    
+    with open(log_path, 'rb') as log_file:
+        for block in iter(lambda: log_file.read(block_size), ""):
+            n_lines += block.count("\n")
+            last = block[-1]
+    
+    # a last line without its line end
+    return n_lines + (last != "\n")
+
+def parseLine(line):
+    return csv.reader([line]).next()
+
+def readHeader(log_path, n_rows=1):
+    with openLog(log_path) as log_file:
+        reader = csv.reader(log_file)
+        return [reader.next() for _ in xrange(n_rows)]
+
+# drop the empty field left by the trailing comma of every log row
+def stripRow(row):
+    return row[:-1] if len(row) and row[-1] == '' else row
+
+# logElitesGenotypes.csv: error titles, generations and error values (the columns before the L0 weights),
+# leaving the weights unconverted; rows of negative generations are left out
+def readGenotypeErrors(log_path):
+    with openLog(log_path) as log_file:
+        header = parseLine(log_file.readline())
+        i_weights = [field.startswith("L0") for field in header].index(True)
+        
+        rows = [line.split(",", i_weights)[:i_weights] for line in log_file if line.strip()]
+    
+    values = np.array(rows, dtype=float).reshape(-1, i_weights)
+    values = values[values[:,0] >= 0]
+    
+    return (header[1:i_weights],values[:,0],values[:,1:])
+
+# column layout of logElitesPhenotypes.csv: generation, formants, params per vowel,
+# then (header rows only) nishimura values per vowel and global ones
+class PhenotypeSchema(object):
+    cache = {}
+
+    def __init__(self, header, n_vowels, n_formants):
+        header = stripRow(header)
+
+        self.n_vowels = n_vowels
+        self.n_formants = n_formants
+
+        # the nishimura block is only there when the last column is a global one
+        n_nishimuras = 0 if "_" in header[-1] else N_GLOBAL_NISHIMURAS + N_VAR_NISHIMURAS * n_vowels
+
+        i_params = n_formants * n_vowels + 1
+        self.n_params = (len(header) - n_nishimuras - i_params) / n_vowels
+        i_nishimuras = i_params + self.n_params * n_vowels
+
+        (self.i_params,self.i_nishimuras) = (i_params,i_nishimuras)
+        self.formants_slice = slice(1, i_params)
+        self.params_slice = slice(i_params, i_nishimuras)
+        self.var_nishimuras_slice = slice(i_nishimuras, i_nishimuras + N_VAR_NISHIMURAS * n_vowels)
+        self.global_nishimuras_slice = slice(i_nishimuras + N_VAR_NISHIMURAS * n_vowels, None)
+        self.has_nishimuras = n_nishimuras > 0
+
+        params = self.params(header)
+        self.vowel_names = [v[0][:v[0].index("_")] for v in params]
+        self.param_names = [v[v.index("_")+1:] for v in params[0]]
+        self.formant_names = [v[v.index("_")+1:] for v in self.formants(header)[0]]
+        self.nishimura_names = []
+        if self.has_nishimuras:
+            self.nishimura_names = [v[v.index("_")+1:] for v in self.varNishimuras(header)[0]] + self.globalNishimuras(header)
+
+        # (n_target, n_alt) -> summary column indices
+        self.summary_indices = {}
+
+    # one schema per distinct header
+    @classmethod
+    def fromHeader(cls, header, n_vowels, n_formants):
+        key = (tuple(header), n_vowels, n_formants)
+
+        try:
+            return cls.cache[key]
+        except KeyError:
+            schema = cls.cache[key] = cls(header, n_vowels, n_formants)
+            return schema
+
+    def split(self, values, size):
+        return [values[i*size:(i+1)*size] for i in xrange(self.n_vowels)]
+
+    def formants(self, line):
+        return self.split(line[self.formants_slice], self.n_formants)
+
+    def params(self, line):
+        return self.split(line[self.params_slice], self.n_params)
+
+    def varNishimuras(self, line):
+        return self.split(line[self.var_nishimuras_slice], N_VAR_NISHIMURAS)
+
+    def globalNishimuras(self, line):
+        return stripRow(line[self.global_nishimuras_slice])
+
+    # summary columns of each vowel: formants, params and nishimuras (its own, then the global ones) of the
+    # target, alt and elite rows, the elite taking the global ones of the target; as indices into
+    # target[1:] + alt[1:] + elite, the numeric fields of the three rows laid end to end
+    def summaryIndex(self, n_target, n_alt):
+        try:
+            return self.summary_indices[(n_target,n_alt)]
+        except KeyError:
+            pass
+
+        (target,alt,elite) = (-1,n_target - 2,n_target + n_alt - 2)
+        n_globals = N_GLOBAL_NISHIMURAS if self.has_nishimuras else 0
+        i_globals = self.i_nishimuras + N_VAR_NISHIMURAS * self.n_vowels
+
+        index = []
+        for i_vowel in xrange(self.n_vowels):
+            columns = range(1 + i_vowel * self.n_formants, 1 + (i_vowel + 1) * self.n_formants)
+            columns += range(self.i_params + i_vowel * self.n_params, self.i_params + (i_vowel + 1) * self.n_params)
+            if self.has_nishimuras:
+                columns += range(self.i_nishimuras + i_vowel * N_VAR_NISHIMURAS, self.i_nishimuras + (i_vowel + 1) * N_VAR_NISHIMURAS)
+
+            global_columns = range(i_globals, i_globals + n_globals)
+            index.append([target + c for c in columns + global_columns] + [alt + c for c in columns + global_columns] +
+                         [elite + c for c in columns] + [target + c for c in global_columns])
+
+        index = self.summary_indices[(n_target,n_alt)] = np.array(index, dtype=np.intp).reshape(self.n_vowels, -1)
+        return index
+
+    # target, alt and elite rows of a rep parsed in one go: summary values as an (n_vowels, n_columns)
+    # array, and the generation of the elite
+    def summaryValues(self, target, alt, elite):
+        values = np.array(target[1:] + alt[1:] + elite, dtype=float)
+        n_fields = len(target) + len(alt) - 2
+
+        return (values[self.summaryIndex(len(target), len(alt))],int(values[n_fields]))
+
+# logElitesPhenotypes.csv: header, target and alt rows read once, elites fetched from the end
+class PhenotypeLog(object):
+    def __init__(self, log_path, n_vowels, n_formants):
+        self.log_path = log_path
+        (self.header,self.target,self.alt) = [stripRow(row) for row in readHeader(log_path, 3)]
+        self.schema = PhenotypeSchema.fromHeader(self.header, n_vowels, n_formants)
+
+    def last(self):
+        return stripRow(parseLine(readLastLine(self.log_path)))
+
+    # last elite logged at or before the given generation
+    def lastUpTo(self, max_generation):
+        for line in iterReversedLines(self.log_path):
+            line = stripRow(parseLine(line))
+
+            try:
+                if int(float(line[0])) <= max_generation:
+                    return line
+            except ValueError:
+                pass
+        return None
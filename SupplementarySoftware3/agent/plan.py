@@ -0,0 +1,135 @@
+import heapq
+from itertools import count
+from runstate import splitRep
+
+def setName(anatomy, vowel_subset):
+    return anatomy + "." + "_".join(vowel_subset)
+
+# the sweep: anatomies x vowel subsets x replications; one record per set,
+# with the rep parameters shared by all of them stored once
+class ExperimentPlan(object):
+    def __init__(self, anatomies, i_anatomies, vowels, n_replications, base_rep):
+        self.sets = [(setName(anatomies[i_anatomy], vowel_subset),i_anatomy,vowel_subset)
+                     for i_anatomy in i_anatomies for vowel_subset in vowels]
+        self.set_index = dict((set_dir, i_set) for (i_set,(set_dir,_,_)) in enumerate(self.sets))
+        self.n_replications = n_replications
+        self.base_rep = base_rep
+
+        # (set_dir, replication) of chains started before
+        self.computed = set()
+
+    def nReps(self):
+        return len(self.sets) * self.n_replications
+
+    def markComputed(self, latest_rep_gens):
+        for item in latest_rep_gens:
+            (set_dir,rep_dir) = (item[0],item[-1])
+            replication = int(rep_dir.split(".")[0][3:])
+
+            if set_dir in self.set_index and replication < self.n_replications:
+                self.computed.add((set_dir,replication))
+
+    # first generations still to run, in queue order
+    def initials(self):
+        for i_rep in xrange(self.n_replications):
+            for (set_dir,i_anatomy,vowel_subset) in self.sets:
+                if (set_dir,i_rep) not in self.computed:
+                    yield (set_dir,i_rep,0,(i_anatomy,vowel_subset))
+
+    def nInitials(self):
+        return self.nReps() - len(self.computed)
+
+    # arguments of generateRep after the rep directory
+    def repArgs(self, set_args):
+        return list(set_args) + self.base_rep
+
+# mean agent runtime per chain and per set, from finished reps, to estimate the work left in a chain
+class DurationEstimates(object):
+    def __init__(self, n_chain_gen):
+        self.n_chain_gen = n_chain_gen
+        # key -> [total runtime, runs]
+        (self.chains,self.sets,self.total) = ({},{},[0.0,0])
+
+    def record(self, set_dir, replication, runtime):
+        for (table,key) in ((self.chains,(set_dir,replication)),(self.sets,set_dir)):
+            entry = table.setdefault(key, [0.0,0])
+            entry[0] += runtime
+            entry[1] += 1
+
+        self.total[0] += runtime
+        self.total[1] += 1
+
+    # "finished" events of the telemetry log
+    def recordEvents(self, events):
+        for e in events:
+            if e["event"] == "finished" and "runtime" in e:
+                self.record(e["set"], splitRep(e["rep"])[0], e["runtime"])
+
+    # the chain's own runs if any, then its set, then the whole sweep
+    def duration(self, set_dir, replication):
+        for (table,key) in ((self.chains,(set_dir,replication)),(self.sets,set_dir)):
+            if key in table:
+                return table[key][0] / table[key][1]
+
+        return self.total[0] / self.total[1] if self.total[1] else 1.0
+
+    # work left in a chain, this generation included
+    def remaining(self, set_dir, replication, chain_gen):
+        return (self.n_chain_gen - chain_gen) * self.duration(set_dir, replication)
+
+# ready reps, by default deepest chain generation first, then lowest replication (first in, first out on ties);
+# follow-ups live in a heap, first generations are drawn lazily from the plan.
+# with duration estimates, the chains with the most work left go first (critical path),
+# so slow sets start early and do not hold up the end of the sweep
+class RepQueue(object):
+    def __init__(self, plan, estimates=None):
+        self.plan = plan
+        self.estimates = estimates
+        self.heap = []
+        self.order = count()
+        self.initials = plan.initials()
+        self.n_initials = plan.nInitials()
+
+        # first generations are ranked against follow-ups too
+        if estimates is not None:
+            for item in self.initials:
+                self.add(item)
+            self.n_initials = 0
+
+    def __len__(self):
+        return len(self.heap) + self.n_initials
+
+    def priority(self, set_dir, replication, chain_gen):
+        if self.estimates is None:
+            return (-chain_gen,replication)
+        return (-self.estimates.remaining(set_dir, replication, chain_gen),-chain_gen,replication)
+
+    # item: (set_dir, replication, chain_gen, set_args)
+    def add(self, item):
+        heapq.heappush(self.heap, (self.priority(*item[:3]),self.order.next(),item))
+
+    # rep entries as returned by attemptNewGens: [set_dir, replication, chain_gen]
+    def push(self, reps):
+        for rep in reps:
+            self.add((rep[0],int(rep[1]),rep[2],None))
+
+    # (set_dir, replication, chain_gen, set_args), set_args only for first generations
+    def pop(self):
+        # in depth order follow-ups are at least one generation deep, so always ahead of first generations
+        if len(self.heap):
+            return heapq.heappop(self.heap)[-1]
+
+        self.n_initials -= 1
+        return self.initials.next()
+
+    # runtime of a finished rep: refines the estimates and re-ranks the queue
+    def record(self, set_dir, replication, runtime):
+        if self.estimates is not None:
+            self.estimates.record(set_dir, replication, runtime)
+
+            self.heap = [(self.priority(*item[:3]),order,item) for (_,order,item) in self.heap]
+            heapq.heapify(self.heap)
+
+    def drain(self):
+        while len(self):
+            yield self.pop()
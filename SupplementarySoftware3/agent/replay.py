@@ -0,0 +1,120 @@
+import heapq
+import math
+import zlib
+import numpy as np
+from plan import RepQueue, DurationEstimates
+from runstate import splitRep
+
+# (set_dir, replication, chain_gen) -> runtime of the finished reps in the telemetry log
+def traceDurations(events):
+    durations = {}
+
+    for e in events:
+        if e["event"] == "finished" and "runtime" in e:
+            durations[(e["set"],) + splitRep(e["rep"])] = e["runtime"]
+
+    return durations
+
+# mean time the controller spends generating a first generation and creating a follow-up, from the telemetry log
+def traceOverheads(events):
+    overheads = []
+
+    for event in ("generated","completed"):
+        durations = [e["duration"] for e in events if e["event"] == event and "duration" in e]
+        overheads.append(sum(durations) / len(durations) if len(durations) else 0.0)
+
+    return tuple(overheads)
+
+# recorded runtimes, reps not in the trace taking the mean of their chain, set or the whole trace
+class RecordedDurations(object):
+    def __init__(self, durations, n_chain_gen):
+        self.durations = durations
+        self.fill = DurationEstimates(n_chain_gen)
+
+        for ((set_dir,replication,_),runtime) in durations.items():
+            self.fill.record(set_dir, replication, runtime)
+
+    def __call__(self, set_dir, replication, chain_gen):
+        return self.durations.get((set_dir,replication,chain_gen), self.fill.duration(set_dir, replication))
+
+# modelled runtimes: lognormal with the given mean and coefficient of variation, drawn once per rep
+# from its name, so every setting is simulated on the same sweep
+class ModelledDurations(object):
+    def __init__(self, mean, spread=0.0, seed=0):
+        self.sigma = math.sqrt(math.log(1 + spread ** 2))
+        self.mu = math.log(mean) - self.sigma ** 2 / 2
+        self.seed = seed
+
+    def __call__(self, set_dir, replication, chain_gen):
+        rep_seed = zlib.crc32("%s/%d/%d/%d" % (set_dir, replication, chain_gen, self.seed)) & 0xffffffff
+        return np.random.RandomState(rep_seed).lognormal(self.mu, self.sigma)
+
+# the local scheduler of chain.py in virtual time: reps launched from the queue into free slots, each first
+# generation generated by the controller before its launch, finished reps noticed on the next watch_interval
+# poll and their follow-ups created (next_gen_time each) and queued before the slots are filled again;
+# runtime(set_dir, replication, chain_gen) gives the agent runtimes.
+# returns (makespan, busy slot-seconds, idle slot-seconds)
+def simulate(plan, n_chain_gen, runtime, n_slots, order="depth", watch_interval=0.0, generate_time=0.0,
+             next_gen_time=0.0):
+    # the policy only learns runtimes as reps finish, as in a live sweep
+    reps = RepQueue(plan, DurationEstimates(n_chain_gen) if order == "critical" else None)
+    (running,now,busy) = ([],0.0,0.0)
+
+    while len(reps) or len(running):
+        while len(reps) and len(running) < n_slots:
+            (set_dir,replication,chain_gen,set_args) = reps.pop()
+
+            if set_args is not None:
+                now += generate_time
+
+            duration = runtime(set_dir, replication, chain_gen)
+            heapq.heappush(running, (now + duration,set_dir,replication,chain_gen,duration))
+
+        # wait: polls from now on, every watch_interval
+        waited = running[0][0] - now
+        if watch_interval > 0:
+            waited = math.ceil(waited / watch_interval) * watch_interval
+        now += max(waited, 0.0)
+
+        finisheds = []
+        while len(running) and running[0][0] <= now:
+            finisheds.append(heapq.heappop(running))
+
+        # complete
+        for (_,set_dir,replication,chain_gen,duration) in finisheds:
+            now += next_gen_time
+            busy += duration
+            reps.record(set_dir, replication, duration)
+
+            if chain_gen < n_chain_gen - 1:
+                reps.push([(set_dir,replication,chain_gen + 1)])
+
+    return (now,busy,n_slots * now - busy)
+
+# replay of the logged runtimes, with reps not in the trace filled in
+def replayTrace(plan, n_chain_gen, durations, n_slots, order="depth"):
+    return simulate(plan, n_chain_gen, RecordedDurations(durations, n_chain_gen), n_slots, order)
+
+def printResult(label, n_slots, result):
+    (makespan,busy,idle) = result
+
+    print "\t%-24s makespan %.2f hours, utilisation %.1f%%, %.2f idle slot-hours" % \
+        (label, makespan / 3600, 100 * busy / (n_slots * makespan) if makespan else 0, idle / 3600)
+
+def printReplay(plan, n_chain_gen, durations, n_slots):
+    print "replaying %d recorded runtimes, %d reps on %d slots" % (len(durations), plan.nReps() * n_chain_gen, n_slots)
+
+    for order in ("depth","critical"):
+        printResult(order, n_slots, replayTrace(plan, n_chain_gen, durations, n_slots, order))
+
+# every combination of slots, queue orders and watch intervals
+def printSimulation(plan, n_chain_gen, runtime, slots, orders, watch_intervals, generate_time=0.0, next_gen_time=0.0):
+    print "%d sets x %d replications x %d chain generations: %d reps" % \
+        (len(plan.sets), plan.n_replications, n_chain_gen, plan.nReps() * n_chain_gen)
+    print "controller: %.2f s per generated rep, %.2f s per follow-up" % (generate_time, next_gen_time)
+
+    for n_slots in slots:
+        for order in orders:
+            for watch_interval in watch_intervals:
+                result = simulate(plan, n_chain_gen, runtime, n_slots, order, watch_interval, generate_time, next_gen_time)
+                printResult("%d slots, %s, watch %gs" % (n_slots, order, watch_interval), n_slots, result)
@@ -0,0 +1,137 @@
+import os
+import sqlite3
+import time
+from logreader import readLastLine
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reps (set_dir TEXT, replication INTEGER, chain_gen INTEGER,
+                                 state TEXT, log_size INTEGER, log_mtime REAL, updated REAL,
+                                 PRIMARY KEY (set_dir, replication, chain_gen));
+CREATE INDEX IF NOT EXISTS reps_state ON reps (state);
+CREATE TABLE IF NOT EXISTS chains (set_dir TEXT, replication INTEGER, chain_gen INTEGER, inter_dir TEXT,
+                                   PRIMARY KEY (set_dir, replication));
+"""
+
+# "rep3.12" -> (3,12)
+def splitRep(rep_dir):
+    (rep,chain_gen) = rep_dir.split(".")
+    return (int(rep[3:]),int(chain_gen))
+
+def repDir(replication, chain_gen):
+    return "rep" + str(replication) + "." + str(chain_gen)
+
+# on-disk index of rep states (queued/running/finished/completed), kept next to the sets
+class RunState(object):
+    def __init__(self, super_path, rebuild=False):
+        self.super_path = super_path
+        db_path = os.path.join(super_path, "_runstate.sqlite")
+        is_new = not os.path.exists(db_path)
+
+        self.db = sqlite3.connect(db_path, timeout=60)
+        self.db.executescript(SCHEMA)
+
+        if is_new or rebuild:
+            self.rebuild()
+
+    # recreate the index from the directory tree, e.g. for experiments run before it existed
+    def rebuild(self):
+        with self.db:
+            self.db.execute("DELETE FROM reps")
+            self.db.execute("DELETE FROM chains")
+
+            for set_dir in os.listdir(self.super_path):
+                set_path = os.path.join(self.super_path, set_dir)
+
+                if set_dir[0] == "_" or not os.path.isdir(set_path):
+                    continue
+
+                for rep_dir in os.listdir(set_path):
+                    if rep_dir[0] != "_":
+                        (state,log_stat) = self.readState(os.path.join(set_path, rep_dir, "output.txt"))
+                        self.write(set_dir, rep_dir, state, log_stat)
+
+                try:
+                    for rep_dir in os.listdir(os.path.join(set_path, "_completed")):
+                        self.write(set_dir, rep_dir, "completed")
+                except OSError:
+                    pass
+
+    # state of a rep from the tail of its output.txt
+    def readState(self, log_path):
+        try:
+            stat = os.stat(log_path)
+            line = readLastLine(log_path)
+        except (OSError,IOError):
+            return ("queued",None)
+
+        if line is not None and line.startswith("Finished!"):
+            return ("finished",None)
+        else:
+            return ("running",(stat.st_size,stat.st_mtime))
+
+    def write(self, set_dir, rep_dir, state, log_stat=None):
+        (replication,chain_gen) = splitRep(rep_dir)
+        (log_size,log_mtime) = log_stat if log_stat is not None else (None,None)
+
+        self.db.execute("INSERT OR REPLACE INTO reps VALUES (?,?,?,?,?,?,?)",
+                        (set_dir, replication, chain_gen, state, log_size, log_mtime, time.time()))
+
+        # latest finished or completed generation per chain
+        if state in ("finished","completed"):
+            inter_dir = "_completed" if state == "completed" else ""
+            self.db.execute("""INSERT OR REPLACE INTO chains
+                               SELECT ?,?,?,? WHERE NOT EXISTS
+                               (SELECT 1 FROM chains WHERE set_dir=? AND replication=? AND chain_gen>?)""",
+                            (set_dir, replication, chain_gen, inter_dir, set_dir, replication, chain_gen))
+
+    def mark(self, set_dir, rep_dir, state, log_stat=None):
+        with self.db:
+            self.write(set_dir, rep_dir, state, log_stat)
+
+    def forget(self, set_dir, rep_dir):
+        (replication,chain_gen) = splitRep(rep_dir)
+
+        with self.db:
+            self.db.execute("DELETE FROM reps WHERE set_dir=? AND replication=? AND chain_gen=?",
+                            (set_dir, replication, chain_gen))
+
+    # only tail-read running reps whose output.txt changed since the last look
+    def refresh(self):
+        rows = self.db.execute("SELECT set_dir, replication, chain_gen, log_size, log_mtime FROM reps WHERE state='running'").fetchall()
+
+        with self.db:
+            for (set_dir,replication,chain_gen,log_size,log_mtime) in rows:
+                rep_dir = repDir(replication, chain_gen)
+                rep_path = os.path.join(self.super_path, set_dir, rep_dir)
+
+                try:
+                    stat = os.stat(os.path.join(rep_path, "output.txt"))
+                except OSError:
+                    if not os.path.exists(rep_path):
+                        self.db.execute("DELETE FROM reps WHERE set_dir=? AND replication=? AND chain_gen=?",
+                                        (set_dir, replication, chain_gen))
+                    continue
+
+                if (stat.st_size,stat.st_mtime) != (log_size,log_mtime):
+                    (state,log_stat) = self.readState(os.path.join(rep_path, "output.txt"))
+                    self.write(set_dir, rep_dir, state, log_stat)
+
+    def running(self):
+        rows = self.db.execute("SELECT set_dir, replication, chain_gen FROM reps WHERE state='running'")
+        return [(set_dir,"",repDir(replication, chain_gen)) for (set_dir,replication,chain_gen) in rows]
+
+    def queued(self):
+        rows = self.db.execute("SELECT set_dir, replication, chain_gen FROM reps WHERE state='queued'")
+        return [(set_dir,replication,chain_gen) for (set_dir,replication,chain_gen) in rows]
+
+    def latest(self):
+        rows = self.db.execute("SELECT set_dir, inter_dir, replication, chain_gen FROM chains")
+        return [(set_dir,inter_dir,repDir(replication, chain_gen)) for (set_dir,inter_dir,replication,chain_gen) in rows]
+
+    def nCompleted(self):
+        return self.db.execute("SELECT COUNT(*) FROM reps WHERE state='completed'").fetchone()[0]
+
+    # same result as chain.scan(), from the index
+    def scan(self):
+        self.refresh()
+        return (self.running(),self.latest(),self.nCompleted())
@@ -0,0 +1,145 @@
+import os
+import json
+import time
+import numpy as np
+
+EVENTS = "_events.jsonl"
+
+# lifecycle of each rep as JSON lines in super_path:
+# queued -> generated -> launched -> finished/exited/stalled -> completed/requeued/abandoned, plus slot usage
+class EventLog(object):
+    def __init__(self, super_path, source="local"):
+        self.events_file = open(os.path.join(super_path, EVENTS), 'ab')
+        # controller or worker the slots belong to
+        self.source = source
+        self.last_slots = None
+
+    def log(self, event, **fields):
+        fields = dict((key, round(value, 3) if isinstance(value, float) else value) for (key,value) in fields.items())
+        fields["event"] = event
+        fields["t"] = round(time.time(), 3)
+
+        # one write per line, so controllers and workers can share the file
+        self.events_file.write(json.dumps(fields, sort_keys=True) + "\n")
+        self.events_file.flush()
+
+    def rep(self, event, set_dir, rep_dir, **fields):
+        self.log(event, set=set_dir, rep=rep_dir, **fields)
+
+    # only logged when something changed
+    def slots(self, used, total, foreign=0):
+        if (used,total,foreign) != self.last_slots:
+            self.last_slots = (used,total,foreign)
+            self.log("slots", used=used, total=total, foreign=foreign, source=self.source)
+
+def readEvents(super_path):
+    events = []
+
+    try:
+        with open(os.path.join(super_path, EVENTS), 'rb') as events_file:
+            for line in events_file:
+                try:
+                    events.append(json.loads(line))
+                # line cut by a crash
+                except ValueError:
+                    pass
+    except IOError:
+        pass
+
+    return events
+
+def percentiles(values):
+    if len(values) == 0:
+        return (float("nan"),float("nan"))
+    return tuple(np.percentile(values, [50, 95]))
+
+# time-weighted share of the slots that were busy, over all controllers and workers
+def slotUtilisation(events, end):
+    sources = {}
+    for e in events:
+        if e["event"] == "slots":
+            sources.setdefault(e.get("source"), []).append(e)
+
+    (busy,available,idle) = (0.0,0.0,0.0)
+
+    for samples in sources.values():
+        for (sample,following) in zip(samples, samples[1:] + [None]):
+            duration = (following["t"] if following is not None else end) - sample["t"]
+            used = sample["used"] + sample.get("foreign", 0)
+
+            busy += min(used, sample["total"]) * duration
+            available += sample["total"] * duration
+            idle += max(sample["total"] - used, 0) * duration
+
+    return (busy / available if available else float("nan"),idle)
+
+def computeStats(events, n_total, n_completed, now=None):
+    now = now or time.time()
+    stats = {"n_total": n_total, "n_completed": n_completed}
+
+    if len(events) == 0:
+        return stats
+
+    # reps completed by the whole log (up to its last event, so a finished sweep keeps its rate), and over the last hour
+    completed = [e["t"] for e in events if e["event"] == "completed"]
+    end = events[-1]["t"]
+    elapsed = end - events[0]["t"]
+    stats["reps_per_hour"] = 3600.0 * len(completed) / elapsed if elapsed > 0 else float("nan")
+    stats["reps_last_hour"] = len([t for t in completed if t >= now - 3600])
+
+    # runtime of the agent per set
+    runtimes = {}
+    for e in events:
+        if e["event"] == "finished" and "runtime" in e:
+            runtimes.setdefault(e["set"], []).append(e["runtime"])
+    stats["runtime"] = dict((set_dir, percentiles(values) + (len(values),)) for (set_dir,values) in runtimes.items())
+
+    # queue wait: from being queued (or the controller starting) to being launched
+    (queued,started,waits) = ({},None,[])
+    for e in events:
+        if e["event"] == "start":
+            (queued,started) = ({},e["t"])
+        elif e["event"] == "queued":
+            queued[(e["set"],e["rep"])] = e["t"]
+        elif e["event"] == "launched":
+            since = queued.pop((e["set"],e["rep"]), started)
+            if since is not None:
+                waits.append(e["t"] - since)
+    stats["queue_wait"] = percentiles(waits)
+
+    # where wall-clock time goes besides the agents
+    for (name,event) in (("generate","generated"),("next_gen","completed")):
+        durations = [e["duration"] for e in events if e["event"] == event and "duration" in e]
+        stats[name + "_time"] = (sum(durations),len(durations))
+
+    (stats["utilisation"],stats["idle_slot_seconds"]) = slotUtilisation(events, end)
+
+    # runs that failed and what became of them
+    stats["failures"] = dict((event, len([e for e in events if e["event"] == event]))
+                             for event in ("exited","stalled","requeued","abandoned"))
+
+    if stats["reps_per_hour"] > 0:
+        stats["eta_hours"] = (n_total - n_completed) / stats["reps_per_hour"]
+
+    return stats
+
+def printStats(stats):
+    print "completed %d of %d reps" % (stats["n_completed"], stats["n_total"])
+
+    if "reps_per_hour" not in stats:
+        print "no events logged yet"
+        return
+
+    print "throughput: %.1f reps/hour overall, %d in the last hour" % (stats["reps_per_hour"], stats["reps_last_hour"])
+    print "slot utilisation: %.1f%% (%.1f idle slot-hours)" % (100 * stats["utilisation"], stats["idle_slot_seconds"] / 3600)
+    print "queue wait: p50 %.1f s, p95 %.1f s" % stats["queue_wait"]
+    print "rep generation: %.1f s over %d reps" % stats["generate_time"]
+    print "next-gen creation: %.1f s over %d reps" % stats["next_gen_time"]
+    print "failed runs: %(exited)d exited, %(stalled)d stalled; %(requeued)d requeued, %(abandoned)d abandoned" % stats["failures"]
+
+    if "eta_hours" in stats:
+        print "estimated time to finish: %.1f hours" % stats["eta_hours"]
+
+    print "runtime per set (p50, p95, runs):"
+    for set_dir in sorted(stats["runtime"]):
+        print "\t%s: %.1f s, %.1f s, %d" % ((set_dir,) + stats["runtime"][set_dir])
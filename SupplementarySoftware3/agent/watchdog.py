@@ -0,0 +1,83 @@
+import os
+import time
+import psutil
+
+# bytes written so far to output.txt and the log files of a rep
+def logSize(rep_path):
+    size = 0
+
+    try:
+        for item in os.listdir(rep_path):
+            if item == "output.txt" or item.startswith("log"):
+                try:
+                    size += os.path.getsize(os.path.join(rep_path, item))
+                except OSError:
+                    pass
+    except OSError:
+        pass
+
+    return size
+
+# the agent and anything it started (e.g. the jvm behind a wrapper command)
+def killTree(process):
+    try:
+        for child in psutil.Process(process.pid).children(recursive=True):
+            child.kill()
+    except psutil.Error:
+        pass
+
+    try:
+        process.kill()
+    except OSError:
+        pass
+
+    # reaped, so its files are released before the rep is reset
+    process.wait()
+
+# progress of the agent runs started here, from the growth of their logs: a run whose logs have not grown
+# for stall_timeout seconds (0: never) is stalled; a rep is run up to max_retries times in all, as with leases
+class Watchdog(object):
+    def __init__(self, stall_timeout=0, max_retries=3):
+        self.stall_timeout = stall_timeout
+        self.max_retries = max_retries
+        # logs are only listed every check_interval seconds
+        self.check_interval = min(max(stall_timeout / 10.0, 1), 60)
+
+        # rep key -> [rep_path, log size, time of the last growth, time of the last check, launch time]
+        self.runs = {}
+        # rep key -> failed attempts
+        self.failures = {}
+
+    def start(self, key, rep_path):
+        now = time.time()
+        self.runs[key] = [rep_path, logSize(rep_path), now, now, now]
+
+    def forget(self, key):
+        self.runs.pop(key, None)
+
+    # bytes per second the logs of a run grew since its launch, logged with stalls
+    def rate(self, key):
+        (_,size,_,last_check,launched) = self.runs[key]
+        return size / (last_check - launched) if last_check > launched else 0.0
+
+    # seconds without progress if the run is stalled, None otherwise
+    def stalled(self, key):
+        run = self.runs[key]
+        now = time.time()
+
+        if not self.stall_timeout or now - run[3] < self.check_interval:
+            return None
+
+        size = logSize(run[0])
+        if size != run[1]:
+            (run[1],run[2]) = (size,now)
+        run[3] = now
+
+        return now - run[2] if now - run[2] >= self.stall_timeout else None
+
+    # count a failed attempt; False once the rep is out of attempts
+    def fail(self, key):
+        self.forget(key)
+        self.failures[key] = self.failures.get(key, 0) + 1
+
+        return self.failures[key] < self.max_retries
@@ -0,0 +1,195 @@
+import os
+import sys
+import csv
+import json
+import time
+import shutil
+import socket
+import platform
+import tempfile
+import argparse
+import subprocess
+
+# bench.py [--scales small,medium] [--only scan,getElite] [--label name]: results go to results/<label>.json
+# bench.py --compare results/<old>.json results/<new>.json
+from synthtree import TreeSpec, makeTree, AGENT_ROOT, BENCH_ROOT
+
+RESULTS_ROOT = os.path.join(BENCH_ROOT, "results")
+SUMMARIZE_ROOT = os.path.join(BENCH_ROOT, os.pardir, "results")
+
+sys.path.append(SUMMARIZE_ROOT)
+from chain import scan, attemptNewGens
+from runstate import RunState
+from assets import AssetStore
+import summarize
+
+SCALES = {"small": TreeSpec(n_anatomies=2, targets=("i","a"), n_replications=2, n_chain_gen=3, n_generations=50),
+          "medium": TreeSpec(n_anatomies=5, targets=("i","ae","u","a","schwa"), n_replications=2, n_chain_gen=5, n_generations=500),
+          "large": TreeSpec(n_anatomies=10, targets=("i","ae","u","a","schwa"), n_targets=2, n_replications=3, n_chain_gen=10, n_generations=500)}
+
+BENCHMARKS = ["scan","runstate_rebuild","runstate_scan","attemptNewGens","get_rep_data","getElite","summarize","scheduler"]
+
+def completedReps(super_path):
+    for set_dir in sorted(os.listdir(super_path)):
+        if set_dir[0] != "_":
+            set_path = os.path.join(super_path, set_dir, "_completed")
+
+            for rep_dir in sorted(os.listdir(set_path)):
+                yield (set_path,rep_dir)
+
+def pendingReps(super_path):
+    return [(set_dir,"",rep_dir) for set_dir in sorted(os.listdir(super_path)) if set_dir[0] != "_"
+            for rep_dir in sorted(os.listdir(os.path.join(super_path, set_dir))) if rep_dir[0] != "_"]
+
+# (set up, timed call) pairs: set up returns the arguments of the call and is not timed
+def benchmarks(super_path, work_path, spec):
+    n_vowels = spec.n_targets
+    reps = list(completedReps(super_path))
+
+    def copyTree():
+        if os.path.exists(work_path):
+            shutil.rmtree(work_path)
+        shutil.copytree(super_path, work_path)
+        return (work_path,)
+
+    def warmIndex():
+        copyTree()
+        RunState(work_path).db.close()
+        return (work_path,)
+
+    def attempt(path):
+        # one chain generation beyond the tree, so every pending rep also gets its follow-up
+        attemptNewGens(path, pendingReps(path), spec.n_chain_gen, spec.n_formants, n_vowels,
+                       assets=AssetStore(os.path.join(path, "_assets")))
+
+    def summarizeSetUp():
+        copyTree()
+        shutil.copy(os.path.join(SUMMARIZE_ROOT, "JD2.speaker"), work_path)
+        return (work_path,)
+
+    def runSummarize(path):
+        subprocess.check_call([sys.executable, os.path.join(SUMMARIZE_ROOT, "summarize.py")], cwd=path, stdout=open(os.devnull, 'wb'))
+
+    def schedulerSetUp():
+        if os.path.exists(work_path):
+            shutil.rmtree(work_path)
+        os.makedirs(work_path)
+        writeSchedulerConfig(work_path, spec)
+        return (work_path,)
+
+    def runScheduler(path):
+        subprocess.check_call([sys.executable, os.path.join(AGENT_ROOT, "chain.py")], cwd=path, stdout=open(os.devnull, 'wb'))
+
+    return {"scan": (lambda: (super_path,), lambda path: scan(path, spec.n_chain_gen, spec.n_replications), spec.nReps()),
+            "runstate_rebuild": (copyTree, lambda path: RunState(path).scan(), spec.nReps()),
+            "runstate_scan": (warmIndex, lambda path: RunState(path).scan(), spec.nReps()),
+            "attemptNewGens": (copyTree, attempt, len(pendingReps(super_path))),
+            "get_rep_data": (lambda: (), lambda: [summarize.get_rep_data(os.path.join(*rep)) for rep in reps], len(reps)),
+            "getElite": (lambda: (), lambda: [summarize.getElite(set_path, rep_dir, 0, False) for (set_path,rep_dir) in reps], len(reps)),
+            "summarize": (summarizeSetUp, runSummarize, len(reps)),
+            "scheduler": (schedulerSetUp, runScheduler, spec.nReps())}
+
+# agent/config.csv with the sweep of the spec, run by the fake agent
+def writeSchedulerConfig(path, spec):
+    config = spec.config(os.path.join(path, "data", ""), "bench")
+    config.update({"agentCommand": [sys.executable, os.path.join(BENCH_ROOT, "fakeagent.py"), "{rep_path}"],
+                   "java_path": [], "pollInterval": 1})
+
+    with open(os.path.join(AGENT_ROOT, "config.csv"), 'rb') as config_file:
+        rows = list(csv.reader(config_file))
+
+    with open(os.path.join(path, "config.csv"), 'wb') as config_file:
+        writer = csv.writer(config_file)
+
+        for row in rows:
+            if row[0] in config:
+                value = config[row[0]]
+                row = [row[0]] + (value if isinstance(value, list) else [value])
+            writer.writerow(row)
+
+def timeCall(set_up, call, repeat):
+    (times,stdout) = ([],sys.stdout)
+
+    # chain.py reports every rep it moves
+    try:
+        sys.stdout = open(os.devnull, 'wb')
+
+        for i in xrange(repeat):
+            args = set_up()
+            start = time.time()
+            call(*args)
+            times.append(time.time() - start)
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+
+    return times
+
+def runScale(name, spec, names, repeat, work_root):
+    tree_path = os.path.join(work_root, name, "tree")
+    work_path = os.path.join(work_root, name, "work")
+
+    print "%s: building %d sets, %d reps ..." % (name, spec.nSets(), spec.nReps())
+    start = time.time()
+    makeTree(tree_path, spec)
+    result = {"params": spec.params(), "build": time.time() - start, "timings": {}}
+
+    calls = benchmarks(tree_path, work_path, spec)
+    for bench_name in names:
+        (set_up,call,n_items) = calls[bench_name]
+        times = timeCall(set_up, call, repeat)
+
+        result["timings"][bench_name] = {"min": min(times), "median": sorted(times)[len(times) / 2], "times": times, "n": n_items}
+        print "\t%s: %.3f s (min of %d), %d items" % (bench_name, min(times), repeat, n_items)
+
+    return result
+
+def compare(old_path, new_path):
+    (old,new) = [json.load(open(path, 'rb')) for path in (old_path,new_path)]
+    print "%s -> %s (min seconds)" % (old["label"], new["label"])
+
+    for scale in sorted(set(old["scales"]) & set(new["scales"])):
+        print scale
+
+        (old_timings,new_timings) = (old["scales"][scale]["timings"],new["scales"][scale]["timings"])
+        for bench_name in BENCHMARKS:
+            if bench_name in old_timings and bench_name in new_timings:
+                (before,after) = (old_timings[bench_name]["min"],new_timings[bench_name]["min"])
+                print "\t%-18s %10.3f %10.3f %8.2fx" % (bench_name, before, after, before / after if after else float("inf"))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="time scans, next-gen creation and summarize on synthetic sweeps")
+    parser.add_argument("--scales", default="small,medium", help="comma-separated, of: " + ", ".join(sorted(SCALES)))
+    parser.add_argument("--only", default=",".join(BENCHMARKS), help="comma-separated benchmarks")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--label", default=None, help="name of the results file")
+    parser.add_argument("--work", default=None, help="directory for the synthetic trees (kept)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD","NEW"), help="compare two results files")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        sys.exit()
+
+    label = args.label or time.strftime("%Y%m%d-%H%M%S") + "-" + socket.gethostname()
+    work_root = args.work or tempfile.mkdtemp(prefix="bench-")
+    names = [v for v in args.only.split(",") if v]
+
+    results = {"label": label, "time": time.time(), "python": platform.python_version(),
+               "platform": platform.platform(), "repeat": args.repeat, "scales": {}}
+
+    try:
+        for scale in args.scales.split(","):
+            results["scales"][scale] = runScale(scale, SCALES[scale], names, args.repeat, work_root)
+    finally:
+        if args.work is None:
+            shutil.rmtree(work_root, ignore_errors=True)
+
+    if not os.path.exists(RESULTS_ROOT):
+        os.makedirs(RESULTS_ROOT)
+
+    results_path = os.path.join(RESULTS_ROOT, label + ".json")
+    with open(results_path, 'wb') as results_file:
+        json.dump(results, results_file, indent=1, sort_keys=True)
+
+    print "results in " + results_path
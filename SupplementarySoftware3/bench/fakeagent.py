@@ -0,0 +1,105 @@
+import os
+import sys
+import csv
+import time
+import random
+import argparse
+
+# stand-in for Agent.jar: reads the config.csv of a rep and writes logs with the layout of the real ones
+PARAMS = ["HX","HY","JA","LP","LD","TCX","TCY","TTX","TTY","TBX","TBY"]
+FORMANT_HZ = [500, 1500, 2500, 3500, 4500, 5500]
+N_VAR_NISHIMURAS = 4
+N_GLOBAL_NISHIMURAS = 6
+N_WEIGHTS = 10
+
+def readRepConfig(rep_path):
+    with open(os.path.join(rep_path, "config.csv"), 'rb') as config_file:
+        config = dict((line[0], line[1:]) for line in csv.reader(config_file) if len(line))
+
+    return (config["targets"],int(config["nFormants"][0]),int(config["nIterations"][0]),int(config["popSize"][0]))
+
+def phenotypeHeader(vowels, n_formants):
+    header = ["generation"]
+    header += [v + "_F" + str(i+1) for v in vowels for i in xrange(n_formants)]
+    header += [v + "_" + param for v in vowels for param in PARAMS]
+    header += [v + "_N" + str(i+1) for v in vowels for i in xrange(N_VAR_NISHIMURAS)]
+    header += ["N" + str(i+1) for i in xrange(N_GLOBAL_NISHIMURAS)]
+
+    return header + [""]
+
+def genotypeHeader(vowels):
+    return ["generation","error"] + ["error_" + v for v in vowels] + ["L0_" + str(i) for i in xrange(N_WEIGHTS)] + ["step" + str(i) for i in xrange(len(PARAMS))] + [""]
+
+def randomPhenotype(rng, vowels, n_formants, spread):
+    formants = [FORMANT_HZ[i % len(FORMANT_HZ)] * (1 + spread * rng.uniform(-0.5, 0.5)) for v in vowels for i in xrange(n_formants)]
+    params = [spread * rng.uniform(-5, 5) for v in vowels for param in PARAMS]
+    nishimuras = [rng.uniform(0, 1) for v in vowels for i in xrange(N_VAR_NISHIMURAS)]
+
+    return (formants,params,nishimuras)
+
+# writes the three logs, one generation at a time as the agent does, and returns the output lines
+def writeLogs(rep_path, delay=0.0, seed=None):
+    (vowels,n_formants,n_generations,pop_size) = readRepConfig(rep_path)
+    rng = random.Random(seed if seed is not None else os.path.abspath(rep_path))
+
+    pheno_file = open(os.path.join(rep_path, "logElitesPhenotypes.csv"), 'wb')
+    geno_file = open(os.path.join(rep_path, "logElitesGenotypes.csv"), 'wb')
+    pop_file = open(os.path.join(rep_path, "logPopulation.csv"), 'wb')
+
+    (pheno_writer,geno_writer,pop_writer) = [csv.writer(f) for f in (pheno_file,geno_file,pop_file)]
+
+    # header, target and alt rows; target and alt carry the global nishimura values too
+    pheno_writer.writerow(phenotypeHeader(vowels, n_formants))
+    for row_name in ("target","alt"):
+        (formants,params,nishimuras) = randomPhenotype(rng, vowels, n_formants, 1.0)
+        pheno_writer.writerow([row_name] + formants + params + nishimuras + [rng.uniform(0, 1) for i in xrange(N_GLOBAL_NISHIMURAS)] + [""])
+
+    geno_writer.writerow(genotypeHeader(vowels))
+    pop_writer.writerow(["generation","best","mean","sd"])
+
+    output = []
+    error = rng.uniform(0.5, 1.0)
+
+    for generation in xrange(n_generations):
+        # elites improve on some generations only, as a plateauing search does
+        if generation == 0 or rng.random() < 0.2:
+            error *= rng.uniform(0.9, 1.0)
+            errors = [error] + [error * rng.uniform(0.5, 1.5) for v in vowels]
+            weights = [rng.gauss(0, 1) for i in xrange(N_WEIGHTS)]
+            steps = [rng.uniform(0, 0.1) for param in PARAMS]
+            geno_writer.writerow([generation] + errors + weights + steps + [""])
+
+        (formants,params,nishimuras) = randomPhenotype(rng, vowels, n_formants, error)
+        pheno_writer.writerow([generation] + formants + params + nishimuras + [""])
+        pop_writer.writerow([generation, error, error * 1.5, error / pop_size])
+
+        if generation % 50 == 0:
+            output.append("generation " + str(generation) + ": " + repr(error))
+
+        if delay:
+            for log_file in (pheno_file,geno_file,pop_file):
+                log_file.flush()
+            time.sleep(delay)
+
+    for log_file in (pheno_file,geno_file,pop_file):
+        log_file.close()
+
+    return output + ["Finished!"]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="fake agent writing realistic logs into a rep directory")
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds per generation")
+    parser.add_argument("--fail", type=float, default=0.0, help="probability of exiting without finishing")
+    parser.add_argument("rep_path")
+    args = parser.parse_args()
+
+    # launched with a trailing separator, as Agent.jar is
+    rep_path = args.rep_path.rstrip("\\/")
+
+    if random.random() < args.fail:
+        print "fake failure"
+        sys.exit(1)
+
+    for line in writeLogs(rep_path, args.delay):
+        print line
+        sys.stdout.flush()
@@ -0,0 +1,105 @@
+import os
+import sys
+import csv
+import shutil
+from itertools import combinations
+
+BENCH_ROOT = os.path.dirname(os.path.abspath(__file__))
+AGENT_ROOT = os.path.join(BENCH_ROOT, os.pardir, "agent")
+CONFIG_ROOT = os.path.join(AGENT_ROOT, "config")
+
+sys.path.append(AGENT_ROOT)
+from chain import generateRep
+from plan import setName
+import fakeagent
+
+# anatomies x vowel subsets x replications x chain generations, with logs of n_generations each
+class TreeSpec(object):
+    def __init__(self, n_anatomies=2, targets=("i","a"), n_targets=1, n_replications=2, n_chain_gen=3,
+                 n_generations=50, n_formants=5, pop_size=100):
+        self.n_anatomies = n_anatomies
+        self.targets = list(targets)
+        self.n_targets = n_targets
+        self.n_replications = n_replications
+        self.n_chain_gen = n_chain_gen
+        self.n_generations = n_generations
+        self.n_formants = n_formants
+        self.pop_size = pop_size
+
+    def params(self):
+        return dict(self.__dict__)
+
+    def vowels(self):
+        return [list(v) for v in combinations(self.targets, self.n_targets)]
+
+    def nSets(self):
+        return self.n_anatomies * len(self.vowels())
+
+    def nReps(self):
+        return self.nSets() * self.n_replications * self.n_chain_gen
+
+    # generateRep arguments after anatomy and vowels, in the order of chain.baseRep
+    def baseRep(self, config_root=CONFIG_ROOT):
+        return [self.n_generations, "exp", [0.5], 0, 0, "sigmoid", self.n_formants, 0.25, "FALSE",
+                "FALSE", "TRUE", "SUS", "SUS", self.pop_size, 1, config_root, "TRUE"]
+
+    # overrides of agent/config.csv running this sweep
+    def config(self, data_root, exp_label):
+        return {"config_root": os.path.join(CONFIG_ROOT, ""), "data_root": data_root, "expLabel": exp_label,
+                "nReplications": self.n_replications, "nChainGen": self.n_chain_gen, "targets": self.targets,
+                "nTargets": self.n_targets, "nFormants": self.n_formants, "iAnatomies": range(self.n_anatomies),
+                "nIterations": self.n_generations, "popSize": self.pop_size}
+
+def readAnatomies(config_root=CONFIG_ROOT):
+    with open(os.path.join(config_root, "anatomy.csv"), 'rb') as anatomy_file:
+        return [line[0].replace(" ", "_") for line in csv.reader(anatomy_file)][2:]
+
+# rep directory with inputs from generateRep and logs from the fake agent
+def makeRep(rep_path, i_anatomy, vowel_subset, spec):
+    stdout = sys.stdout
+
+    # generateRep reports every rep
+    try:
+        sys.stdout = open(os.devnull, 'wb')
+        generateRep(rep_path, i_anatomy, vowel_subset, *spec.baseRep())
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+
+    with open(os.path.join(rep_path, "output.txt"), 'wb') as output_file:
+        for line in fakeagent.writeLogs(rep_path):
+            output_file.write(line + "\r\n")
+
+# a sweep as chain.py leaves it: earlier generations in _completed, the latest one
+# finished in the set directory unless n_pending is 0, waiting for attemptNewGens
+def makeTree(super_path, spec, n_pending=1):
+    anatomies = readAnatomies()
+
+    if os.path.exists(super_path):
+        shutil.rmtree(super_path)
+
+    for i_anatomy in xrange(spec.n_anatomies):
+        for vowel_subset in spec.vowels():
+            set_path = os.path.join(super_path, setName(anatomies[i_anatomy], vowel_subset))
+            os.makedirs(os.path.join(set_path, "_completed"))
+
+            for i_rep in xrange(spec.n_replications):
+                for chain_gen in xrange(spec.n_chain_gen):
+                    rep_dir = "rep" + str(i_rep) + "." + str(chain_gen)
+
+                    if chain_gen < spec.n_chain_gen - n_pending:
+                        rep_path = os.path.join(set_path, "_completed", rep_dir)
+                    else:
+                        rep_path = os.path.join(set_path, rep_dir)
+
+                    makeRep(rep_path, i_anatomy, vowel_subset, spec)
+
+    return super_path
+
+if __name__ == "__main__":
+    # synthtree.py <super_path> [n_anatomies n_replications n_chain_gen n_generations]
+    args = [int(v) for v in sys.argv[2:]]
+    spec = TreeSpec(**dict(zip(["n_anatomies","n_replications","n_chain_gen","n_generations"], args)))
+
+    makeTree(sys.argv[1], spec)
+    print "%d sets, %d reps in %s" % (spec.nSets(), spec.nReps(), sys.argv[1])
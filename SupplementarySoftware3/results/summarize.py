@@ -1,40 +1,19 @@
 import os
+import sys
 import csv
+import time
+import shutil
+import multiprocessing
+from itertools import izip
+import numpy as np
 import xml.etree.ElementTree as ET
-from scipy.interpolate import interp1d
 
-def getValues(line, n_targets, n_formants, n_global_nishimuras, n_var_nishimuras):
-    i_params = n_formants*n_targets+1
-        
-    if line[-1] == '':
-        line = line[:-1]
-        
-    try:
-        line[-1].index("_")
-        n_nishimuras = 0
-    except ValueError:
-        n_nishimuras = n_global_nishimuras + n_var_nishimuras * n_targets
-                             
-    generation = line[0]
-    
-    formants = line[1:i_params]
-    formants = [formants[i*n_formants:(i+1)*n_formants] for i in xrange(n_targets)]
-    
-    if n_nishimuras == 0:
-        params = line[i_params:]
-    else:
-        params = line[i_params:-n_nishimuras]
-        
-    n_params = len(params) / n_targets
-    params = [params[i*n_params:(i+1)*n_params] for i in xrange(n_targets)]
-    
-    nishimuras = line[-n_nishimuras:]
-    nishimuras = [nishimuras[i*n_var_nishimuras:(i+1)*n_var_nishimuras] for i in xrange(n_targets)]
-    
-    if n_global_nishimuras != 0:
-        nishimuras = [v + line[-n_global_nishimuras:] for v in nishimuras]
-       
-    return (generation,formants,params,nishimuras)   
+# log readers and file helpers shared with chain.py
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "agent"))
+from logreader import PhenotypeLog, PhenotypeSchema, countLines, readGenotypeErrors
+from summarycache import SummaryCache, repSignature
+from fileutil import replaceFile
+from summarycolumns import ColumnWriter
 
 def getFixedParam(rep_path, i_anatomy):
     abbreviations = {"Vert. hyoid pos.":"HY", 'Horz. jaw pos.':"JX", 'Velum shape':"VS", 
@@ -59,20 +38,24 @@ def getFixedParam(rep_path, i_anatomy):
                         
     return (header_abbrevs,line[1:])
 
+# first generation from which the error stops decreasing over a window of a fifth of the run
 def terminationCondition(timeseries, n_generations, ax1=None, ax2=None):
-    window_size = n_generations / 5
-    
-    derivatives = []
-    
-    for i in xrange(len(timeseries) - window_size):
-        dy = timeseries[i+window_size] - timeseries[i]
-        derivative = dy / window_size
-        derivatives.append(derivative)
+    (terminator_xs,terminator_ys) = terminationConditions([timeseries], n_generations)
+    terminator_x = int(terminator_xs[0]) if terminator_xs[0] >= 0 else None
     
-    xs = range(window_size,len(timeseries))       
+    # the derivatives are only worked out again for plotting
+    if ax1 is not None or ax2 is not None:
+        window_size = n_generations / 5
+        timeseries = np.asarray(timeseries, dtype=float)
+        derivatives = (timeseries[window_size:] - timeseries[:len(timeseries)-window_size]) / window_size
+        plotTermination(ax1, ax2, derivatives, window_size, 0, terminator_x)
     
-    threshold = 0
-    belows = [i for (i,v) in enumerate(derivatives) if v >= threshold]
+    if terminator_x is None:
+        return None
+    return (terminator_x,terminator_ys[0])
+
+def plotTermination(ax1, ax2, derivatives, window_size, threshold, terminator_x):
+    xs = range(window_size,window_size + len(derivatives))       
     
     try:
         ax2.plot(xs, derivatives, label="window: " + str(window_size), lw=1)
@@ -80,63 +63,41 @@ def terminationCondition(timeseries, n_generations, ax1=None, ax2=None):
     except AttributeError:
         pass
     
-    try:        
-        terminator_x = belows[0]
-        terminator_y = timeseries[terminator_x]
-        
+    if terminator_x is not None:
         try:
             ax1.axvline(x=terminator_x, color='k', lw=1, ls='--')
             ax1.axvline(x=terminator_x + window_size, color='k', lw=1, ls='--')
             ax2.axvline(x=terminator_x + window_size, color='k', lw=1, ls='--')
         except AttributeError:
             pass
-            
-        terminator = (terminator_x,terminator_y)  
-    except IndexError:
-        terminator = None
+
+# terminationCondition of many series at once, one per row of equal length and n_generations;
+# returns the terminators and their values, -1 and nan where a series never levels off
+def terminationConditions(timeseries, n_generations):
+    window_size = n_generations / 5
+    
+    timeseries = np.atleast_2d(np.asarray(timeseries, dtype=float))
+    derivatives = (timeseries[:,window_size:] - timeseries[:,:timeseries.shape[1]-window_size]) / window_size
+    
+    levelled = derivatives >= 0
+    found = levelled.any(axis=1)
+    terminator_xs = np.where(found, levelled.argmax(axis=1), -1)
     
-    return terminator
+    terminator_ys = np.where(found, timeseries[np.arange(len(timeseries)),np.maximum(terminator_xs, 0)], np.nan)
+    
+    return (terminator_xs,terminator_ys)
 
+# error series of the elites, one row per error column, held from one logged generation to the next
+# and up to the number of generations in logPopulation.csv
 def get_rep_data(repRoot):    
-    with open(os.path.join(repRoot,"logPopulation.csv"),'rb') as populationFile:
-        nGenerations = len(list(populationFile)) - 1
+    nGenerations = countLines(os.path.join(repRoot,"logPopulation.csv")) - 1
+    (_,generations,errors) = readGenotypeErrors(os.path.join(repRoot,"logElitesGenotypes.csv"))
     
-    elite_data = []
-    with open(os.path.join(repRoot,"logElitesGenotypes.csv"),'rb') as elitesFile:        
-        eliteReader = csv.reader(elitesFile)
-        eliteHeader = eliteReader.next()
-        
-        for (i,field) in enumerate(eliteHeader):
-            if field.startswith("L0"):
-                error_titles = eliteHeader[1:i]
-                i_weights_start = i
-                break
-            
-        for (i,field) in enumerate(eliteHeader):            
-            if field.startswith("step"):
-                i_step_start = i
-                break
-              
-        for line in eliteReader:
-            values = [float(v) for v in line[:-1]]
-            
-            if values[0] >= 0:
-                elite_data.append(values)
-                
-    elite_data = zip(*elite_data)
-    (generations,errors) = (elite_data[0],elite_data[1:i_weights_start])
-    
-    xs = [x for x in xrange(int(generations[-1])+1)]               
-    
-    interpolated_errors = []
-    for error in errors:
-        interpolator = interp1d(generations, error, kind='zero')
-        interpolated_error = interpolator(xs)
-        
-        interpolated_error = list(interpolated_error)    
-        interpolated_error += [interpolated_error[-1]] * ((nGenerations + 1) - len(interpolated_error))        
-        
-        interpolated_errors.append(interpolated_error)       
+    # zero-order hold: last logged generation at or before each one
+    xs = np.arange(max(int(generations[-1]), nGenerations) + 1)
+    i_rows = np.searchsorted(generations, xs, side='right') - 1
+    
+    interpolated_errors = errors[np.maximum(i_rows, 0)].T
     
     return (interpolated_errors,nGenerations)
 
@@ -168,39 +129,18 @@ def getElite(set_path,rep,n_maxed_out,use_x_terminator=True):
     else:
         x_terminator = max_generation + 1
     
-    elite_path = os.path.join(rep_path,"logElitesPhenotypes.csv")
+    elite_log = PhenotypeLog(os.path.join(rep_path,"logElitesPhenotypes.csv"), n_targets, n_formants)
+    (header,target,alt) = (elite_log.header,elite_log.target,elite_log.alt)
     
-    with open(elite_path, 'rb') as elite_file:
-        reader = csv.reader(elite_file)
-        
-        headers = [reader.next() for _ in xrange(3)]
-        headers = [item[:-1] if item[-1]== '' else item for item in headers]
-        (header,target,alt) = headers
-        
-        for line in reader:
-            if line[-1] == '':
-                line = line[:-1]
-                                      
-            try:
-                generation = int(float(line[0]))
-            
-                if generation > x_terminator:
-                    break
-                else:
-                    n_line = line
-            except ValueError:
-                pass
+    # last elite up to the terminator, read from the end of the log
+    n_line = elite_log.lastUpTo(x_terminator)
     
     if len(header) > len(alt):
         alt = [alt[0]] + [0] * (len(header) - len(alt)) + alt[1:]
         
     return (fixed_header,fixed_param,header,target,alt,n_line,n_targets,n_formants,vowels,n_maxed_out)
 
-def writeXML(base_tree, vowel, header_fixed, params_fixed, header_params, values_params):
-    root_node = base_tree.getroot()
-    node_vt = root_node.findall("vocal_tract_model")[0]
-    node_shapes = node_vt.findall("shapes")[0]
-    
+def shapeElement(vowel, header_fixed, params_fixed, header_params, values_params):
     new_shape = ET.Element("shape")
     new_shape.set("name", vowel)
     
@@ -215,27 +155,134 @@ def writeXML(base_tree, vowel, header_fixed, params_fixed, header_params, values
         
         new_shape.append(new_param)
     
-    node_shapes.append(new_shape)
+    return new_shape
 
-if __name__ == "__main__":
-    root = r"./"
+def writeXML(base_tree, vowel, header_fixed, params_fixed, header_params, values_params):
+    root_node = base_tree.getroot()
+    node_vt = root_node.findall("vocal_tract_model")[0]
+    node_shapes = node_vt.findall("shapes")[0]
     
-    #i_truncate = 50
-    i_truncate = None
-    use_x_terminator = False
+    node_shapes.append(shapeElement(vowel, header_fixed, params_fixed, header_params, values_params))
+
+# writes a speaker file as shapes come: the template up to the end of the vocal tract shapes,
+# each shape as it is added, then the rest of the template. The output is the same as appending
+# the shapes to the parsed template and writing the tree, and only replaces output_path when closed
+class SpeakerWriter(object):
+    MARKER = "shapes_end_marker"
+    
+    def __init__(self, template_path, output_path):
+        tree = ET.parse(template_path)
+        template = ET.tostring(tree.getroot())
+        
+        node_shapes = tree.getroot().findall("vocal_tract_model")[0].findall("shapes")[0]
+        node_shapes.append(ET.Element(self.MARKER))
+        (self.head,self.tail) = ET.tostring(tree.getroot()).split("<" + self.MARKER + " />")
+        
+        # every shape and setting of the template is carried over
+        if self.head + self.tail != template:
+            raise ValueError(template_path + " does not round-trip through the speaker writer")
+        
+        self.output_path = output_path
+        self.partial_path = output_path + ".partial"
+        self.output_file = open(self.partial_path, 'wb')
+        self.output_file.write(self.head)
+        
+    def add(self, vowel, header_fixed, params_fixed, header_params, values_params):
+        self.output_file.write(ET.tostring(shapeElement(vowel, header_fixed, params_fixed, header_params, values_params)))
+    
+    # a complete speaker file with the shapes so far, while more are still to come
+    def checkpoint(self):
+        position = self.output_file.tell()
+        self.output_file.write(self.tail)
+        self.output_file.flush()
+        
+        shutil.copyfile(self.partial_path, self.output_path + ".checkpoint")
+        replaceFile(self.output_path + ".checkpoint", self.output_path)
+        
+        self.output_file.seek(position)
+        self.output_file.truncate()
     
-    sets = os.listdir(root)
-    output = []
+    def close(self):
+        self.output_file.write(self.tail)
+        self.output_file.close()
+        replaceFile(self.partial_path, self.output_path)
+
+# the speaker file the shapes are added to. The output replaces JD2.speaker in the results root, so the
+# first run keeps JD2.speaker as it was in JD2.speaker.template and every run starts from that copy
+def speakerTemplate(root):
+    speaker_path = os.path.join(root, "JD2.speaker")
+    template_path = speaker_path + ".template"
+    
+    if not os.path.exists(template_path):
+        shutil.copyfile(speaker_path, template_path)
+    
+    return template_path
+
+# chain.py compacts the logs of completed reps (compactLogs), which can remove a plain log between
+# resolving and opening it: the rep is then read once more, its logs resolving to the .gz copies
+def summarizeRep(task):
+    try:
+        return readRep(task)
+    except (IOError,OSError):
+        return readRep(task)
+
+# summary rows and speaker shapes of one rep, in the order the serial loop adds them
+def readRep(task):
+    (set,set_path,irep,rep,use_x_terminator) = task
+    
+    # get elite data
+    (header_fixed,params_fixed,header,target,alt,elite,n_targets,n_formants,vowels,n_maxed_out) = getElite(set_path,rep,0,use_x_terminator)
+    
+    # column layout from the header, values of the target, alt and elite rows parsed in one go
+    schema = PhenotypeSchema.fromHeader(header, n_targets, n_formants)
+    
+    output_header = ["condition","vowel","replication","chain_gen"]
+    
+    for data_type in ("_target","_alt","_elite"):
+        output_header += [item + data_type for item in schema.formant_names + schema.param_names + schema.nishimura_names]
     
-    tree = ET.parse("JD2.speaker")
-    n_maxed_out = [0] * len(sets)
+    output_header.append("generation")
+    
+    (values,generation) = schema.summaryValues(target, alt, elite)
+    
+    try:
+        i_rep = int(rep[3:])
+    except ValueError:
+        rep_gen = rep.split(".")
+        (i_rep,i_gen) = (int(rep_gen[0][3:]),int(rep_gen[1]))
+    
+    # rows of the new file
+    rows = [[set[:set.index(".")],vowel,i_rep,i_gen] + vowel_values + [generation]
+            for (vowel,vowel_values) in zip(vowels, values.tolist())]
+    
+    (header_params,targets_params,reps_params) = [schema.params(line) for line in (header,target,elite)]
+    
+    # XML shapes, the target shapes along with the first rep of a set
+    if irep == 0:
+        reps_params = [targets_params[0]] + reps_params
+        target_header = ["target." + v for v in header_params[0]]
+        header_params = [target_header] + header_params
+    
+    shapes = []
+    for (params_sound_rep,header_sound_rep) in zip(reps_params,header_params):                        
+        vowel = header_sound_rep[0][:header_sound_rep[0].index("_")]
+        name = set[:set.index(".")] + "_" + rep + "_" + vowel
+        header_sound_rep = [item[item.index("_")+1:] for item in header_sound_rep]
+        
+        shapes.append((name, header_fixed, params_fixed, header_sound_rep, params_sound_rep))
     
-    for (i_set,set) in enumerate(sets):
+    return (output_header,rows,shapes,n_maxed_out)
+
+# reps of all sets, in summary order
+def listReps(root, sets, i_truncate=None, use_x_terminator=False):
+    tasks = []
+    
+    for set in sets:
         if set[0] != "_":
             try:
                 set_path = os.path.join(root, set, "_completed")
                 reps = os.listdir(set_path)
-            except WindowsError:
+            except OSError:
                 reps = []
             
             reps = sorted(reps, key=lambda x: int(x[3:x.index(".")]))      
@@ -247,86 +294,235 @@ if __name__ == "__main__":
             
             for (irep,rep) in enumerate(reps):
                 if rep[0] != "_":  
-                    # get elite data
-                    (header_fixed,params_fixed,header,target,alt,elite,n_targets,n_formants,vowels,n_maxed_out[i_set]) = getElite(set_path,rep,n_maxed_out[i_set],use_x_terminator)
-                    
-                    n_global_nishimuras=6
-                    n_var_nishimuras=4
-                    
-                    # get values and generate header
-                    (_,header_formants,header_params,header_nishimura) = getValues(header, n_targets, n_formants, n_global_nishimuras, n_var_nishimuras)
-                    
-                    new_header_nishimura = []
-                    for vowel in header_nishimura:                    
-                        try:
-                            vowel = [v[v.index("_")+1:] for v in vowel[:n_var_nishimuras]] + vowel[-n_global_nishimuras:]
-                        except ValueError:
-                            pass
-                        
-                        new_header_nishimura.append(vowel) 
-                    header_nishimura = new_header_nishimura
-                    
-                    if len(output) == 0:
-                        output_header = ["condition","vowel","replication","chain_gen"]
-                        
-                        for data_type in ("_target","_alt","_elite"):
-                            output_header += [item[item.index("_")+1:] + data_type for item in header_formants[0]]
-                            output_header += [item[item.index("_")+1:] + data_type for item in header_params[0]]
-                            output_header += [item + data_type for item in header_nishimura[0]]
-                        
-                        output_header.append("generation")
-                        
-                        output.append(output_header)           
+                    tasks.append((set,set_path,irep,rep,use_x_terminator))
                     
-                    # get targets, alts and elite                 
-                    (_,targets_formants,targets_params,targets_nishimura) = getValues(target, n_targets, n_formants, n_global_nishimuras, n_var_nishimuras)                    
-                    (_,alts_formants,alts_params,alts_nishimura) = getValues(alt, n_targets, n_formants,  n_global_nishimuras, n_var_nishimuras)   
-                    (generation,reps_formants,reps_params,reps_nishimura) = getValues(elite, n_targets, n_formants, 0, n_var_nishimuras)
-                    
-                    reps_nishimura = [sum([u,v[-n_global_nishimuras:]],[]) for (u,v) in zip(reps_nishimura,targets_nishimura)] 
-                    data = zip(vowels,targets_formants, targets_params, targets_nishimura, alts_formants, alts_params, alts_nishimura, reps_formants, reps_params, reps_nishimura)
-                    
-                    # wrtite new file
-                    for new_line in data:
-                        vowel = new_line[0]
-                        
-                        try:
-                            i_rep = int(rep[3:])
-                        except ValueError:
-                            rep_gen = rep.split(".")
-                            (i_rep,i_gen) = (int(rep_gen[0][3:]),int(rep_gen[1]))
-                        
-                        line_output = [set[:set.index(".")],vowel,i_rep,i_gen]
-                        
-                        for line_group in new_line[1:]:
-                            line_output += [float(v) for v in line_group]
-                            
-                        line_output.append(int(float(generation)))
-                        
-                        output.append(line_output)
-                    
-                    # generate XML
-                    root_node = tree.getroot()
-                    node_vt = root_node.findall("vocal_tract_model")[0]
-                    node_shapes = node_vt.findall("shapes")[0]                   
-                    
-                    if irep == 0:
-                        reps_params = [targets_params[0]] + reps_params
-                        target_header = ["target." + v for v in header_params[0]]
-                        header_params = [target_header] + header_params
+    return tasks
+
+# summaries of the reps, from a pool of processes if n_processes > 1; always in task order
+def summarizeReps(tasks, n_processes=1):
+    if n_processes <= 1:
+        for task in tasks:
+            yield summarizeRep(task)
+        return
+    
+    pool = multiprocessing.Pool(n_processes)
+    
+    try:
+        for result in pool.imap(summarizeRep, tasks, chunksize=max(1, len(tasks) / (4 * n_processes))):
+            yield result
+        pool.close()
+    except:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+
+# (task, summary) of the reps, parsed only for reps that are not in the cache or changed since; in task order.
+# entries of reps that are no longer there are evicted at the end, unless evict is False
+def cachedSummaries(tasks, cache, n_processes=1, commit_every=100, evict=True):
+    rep_paths = [os.path.join(task[1], task[3]) for task in tasks]
+    signatures = [repSignature(rep_path) for rep_path in rep_paths]
+    hits = [cache.valid(*entry) for entry in izip(rep_paths, signatures, tasks)]
+    
+    parsed = summarizeReps([task for (task,hit) in izip(tasks, hits) if not hit], n_processes)
+    n_parsed = 0
+    
+    for (task,rep_path,signature,hit) in izip(tasks, rep_paths, signatures, hits):
+        if hit:
+            yield (task,cache.get(rep_path))
+        else:
+            result = parsed.next()
+            cache.put(rep_path, signature, task, result)
+            
+            n_parsed += 1
+            if n_parsed % commit_every == 0:
+                cache.commit()
+            
+            yield (task,result)
+    
+    if evict:
+        cache.evict(rep_paths)
+    cache.commit()
+
+# new reps of a running experiment, a list of tasks per poll: a set is only listed again when its
+# _completed directory changed, chain.py moving reps there once their agents have finished.
+# idle is called after a poll that found new reps, once they are summarized
+def followReps(super_path, interval=60, idle=None, use_x_terminator=False):
+    (mtimes,seen,started) = ({},set(),set())
+    
+    while True:
+        tasks = []
+        
+        # not started yet
+        try:
+            set_dirs = sorted(os.listdir(super_path))
+        except OSError:
+            set_dirs = []
+        
+        for set_dir in set_dirs:
+            set_path = os.path.join(super_path, set_dir, "_completed")
+            
+            try:
+                mtime = os.stat(set_path).st_mtime
+            except OSError:
+                continue
+            
+            # a change within the same mtime tick as the last listing would go unnoticed
+            if set_dir[0] == "_" or (mtimes.get(set_dir) == mtime and time.time() - mtime > 2):
+                continue
+            mtimes[set_dir] = mtime
+            
+            for rep in sorted(os.listdir(set_path), key=lambda x: int(x[3:x.index(".")])):
+                if rep[0] != "_" and (set_dir,rep) not in seen:
+                    seen.add((set_dir,rep))
                     
-                    for (params_sound_rep,header_sound_rep) in zip(reps_params,header_params):                        
-                        vowel = header_sound_rep[0][:header_sound_rep[0].index("_")]
-                        name = set[:set.index(".")] + "_" + rep + "_" + vowel
-                        header_sound_rep = [item[item.index("_")+1:] for item in header_sound_rep]
-                        
-                        writeXML(tree, name, header_fixed, params_fixed, header_sound_rep, params_sound_rep)   
+                    # target shapes come with the first rep of a set
+                    tasks.append((set_dir,set_path,0 if set_dir not in started else 1,rep,use_x_terminator))
+                    started.add(set_dir)
+        
+        yield tasks
+        
+        if idle is not None and len(tasks):
+            idle()
+        time.sleep(interval)
+
+# (task, summary) of the reps of a running experiment, as chain.py completes them; reps that could not
+# be read are tried again on the next poll
+def followSummaries(super_path, cache, n_processes=1, interval=60, idle=None):
+    retries = []
+    
+    for tasks in followReps(super_path, interval, idle):
+        (tasks,retries) = (retries + tasks,[])
+        n_done = 0
+        
+        try:
+            for item in cachedSummaries(tasks, cache, n_processes, evict=False):
+                n_done += 1
+                yield item
+        except (IOError,OSError):
+            print "\treading again on the next poll: %d reps" % (len(tasks) - n_done)
+            retries = tasks[n_done:]
+
+# writes the rows of each rep to summary.csv as they come, the header with the first rep,
+# flushing at rep boundaries; passes the results on
+def writeSummary(results, summary_path):
+    with open(summary_path, 'wb') as output_file:
+        writer = csv.writer(output_file)
+        
+        for (i_result,item) in enumerate(results):
+            (output_header,rows) = item[1][:2]
+            
+            if i_result == 0:
+                writer.writerow(output_header)
+            writer.writerows(rows)
+            output_file.flush()
+            
+            yield item
+
+# the same rows as typed column files of a summarycolumns.ColumnWriter; passes the results on
+def writeColumns(results, writer):
+    for item in results:
+        writer.write(*item[1][:2])
+        yield item
+    
+    writer.close()
+
+# rows of a summary.csv that may still be being written, leaving out a last line that is not complete yet
+def readSummary(summary_path):
+    with open(summary_path, 'rb') as summary_file:
+        for line in summary_file:
+            if not line.endswith("\n"):
+                break
+            yield csv.reader([line]).next()
+
+if __name__ == "__main__":
+    root = r"./"
+    
+    #i_truncate = 50
+    i_truncate = None
+    use_x_terminator = False
+    # "summarize.py --processes N" summarizes reps in N processes
+    n_processes = 1
+    # "summarize.py --speaker-per-condition" writes JD2.<condition>.speaker files instead of one JD2.speaker
+    speaker_per_condition = "--speaker-per-condition" in sys.argv
+    # "summarize.py --columns" also exports the summary as binary columns to summary_columns/
+    export_columns = "--columns" in sys.argv
+    # "summarize.py --rebuild-cache" parses every rep again
+    cache = SummaryCache(os.path.join(root, "_summary_cache.sqlite"), rebuild="--rebuild-cache" in sys.argv)
+    # "summarize.py --follow <data_root/expLabel> [--interval S]" summarizes a running experiment
+    # as its reps complete, until interrupted
+    follow_path = None
+    interval = 60
+    
+    if "--processes" in sys.argv:
+        n_processes = int(sys.argv[sys.argv.index("--processes") + 1])
+    if "--follow" in sys.argv:
+        follow_path = sys.argv[sys.argv.index("--follow") + 1]
+    if "--interval" in sys.argv:
+        interval = float(sys.argv[sys.argv.index("--interval") + 1])
+    
+    speakers = {}
+    template_path = speakerTemplate(root)
+    columns = ColumnWriter(os.path.join(root, "summary_columns")) if export_columns else None
+    
+    # outputs complete up to the reps summarized so far, while following
+    def checkpoint():
+        for speaker in speakers.values():
+            speaker.checkpoint()
+        if columns is not None:
+            columns.checkpoint()
+    
+    if follow_path is None:
+        sets = os.listdir(root)
+        tasks = listReps(root, sets, i_truncate, use_x_terminator)
+        results = cachedSummaries(tasks, cache, n_processes)
+    else:
+        (sets,tasks) = ([],[])
+        results = followSummaries(follow_path, cache, n_processes, interval, checkpoint)
+    
+    # summary rows are written as reps are summarized
+    results = writeSummary(results, os.path.join(root, "summary.csv"))
+    
+    if columns is not None:
+        results = writeColumns(results, columns)
+    
+    n_maxed_out = {}
+    n_reps = 0
+    
+    try:
+        for (task,(_,_,shapes,n_maxed)) in results:
+            set = task[0]
+            n_maxed_out[set] = n_maxed_out.get(set, 0) + n_maxed
+            n_reps += 1
+            
+            if set not in sets:
+                sets.append(set)
+            
+            # generate XML
+            condition = set[:set.index(".")] if speaker_per_condition else None
+            
+            if condition not in speakers:
+                speaker_name = "JD2." + condition + ".speaker" if speaker_per_condition else "JD2.speaker"
+                speakers[condition] = SpeakerWriter(template_path, os.path.join(root, speaker_name))
+            
+            for shape in shapes:
+                speakers[condition].add(*shape)
+    except KeyboardInterrupt:
+        if follow_path is None:
+            raise
+        
+        if columns is not None:
+            columns.close()
+    
+    n_maxed_out = [n_maxed_out.get(set, 0) for set in sets]
     
     print zip(sets,n_maxed_out)
     print sum(n_maxed_out)
-    tree.write(os.path.join(root, "JD2.speaker"))
+    print "%d of %d reps from the cache" % (cache.n_hits, n_reps)
+    cache.close()
+    
+    if len(speakers) == 0:
+        speakers[None] = SpeakerWriter(template_path, os.path.join(root, "JD2.speaker"))
     
-    with open(os.path.join(root,"summary.csv"), 'wb') as output_file:
-        writer = csv.writer(output_file)    
-        for line in output:
-            writer.writerow(line)
+    for speaker in speakers.values():
+        speaker.close()
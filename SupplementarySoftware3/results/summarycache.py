@@ -0,0 +1,78 @@
+import os
+import sys
+import json
+import sqlite3
+import cPickle
+
+# log readers shared with chain.py
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "agent"))
+from logreader import resolveLog
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reps (rep_path TEXT PRIMARY KEY, signature TEXT, task TEXT, result BLOB);
+"""
+
+# files a rep summary is parsed from
+REP_FILES = ["config.csv","anatomy.csv","logElitesGenotypes.csv","logElitesPhenotypes.csv","logPopulation.csv"]
+
+# (size, mtime) of the files of a rep, missing files included; logs as compacted if they are
+def repSignature(rep_path):
+    signature = []
+
+    for name in REP_FILES:
+        try:
+            info = os.stat(resolveLog(os.path.join(rep_path, name)))
+            signature.append((info.st_size,info.st_mtime))
+        except OSError:
+            signature.append(None)
+
+    return json.dumps(signature)
+
+# parsed summaries of completed reps, kept next to the sets (skipped as a set for its "_" prefix);
+# an entry is used while the files of its rep and the task it was made for are unchanged
+class SummaryCache(object):
+    def __init__(self, db_path, rebuild=False):
+        self.db = sqlite3.connect(db_path)
+        self.db.executescript(SCHEMA)
+        self.db.text_factory = str
+
+        if rebuild:
+            with self.db:
+                self.db.execute("DELETE FROM reps")
+
+        # rep path -> (signature, task), loaded once
+        self.entries = dict((rep_path, (signature,task)) for (rep_path,signature,task) in
+                            self.db.execute("SELECT rep_path, signature, task FROM reps"))
+        self.n_hits = 0
+
+    def valid(self, rep_path, signature, task):
+        return self.entries.get(rep_path) == (signature,json.dumps(task))
+
+    def get(self, rep_path):
+        self.n_hits += 1
+        (result,) = self.db.execute("SELECT result FROM reps WHERE rep_path=?", (rep_path,)).fetchone()
+        return cPickle.loads(str(result))
+
+    def put(self, rep_path, signature, task, result):
+        self.entries[rep_path] = (signature,json.dumps(task))
+        self.db.execute("INSERT OR REPLACE INTO reps VALUES (?,?,?,?)",
+                        (rep_path, signature, json.dumps(task), sqlite3.Binary(cPickle.dumps(result, 2))))
+
+    # drop the entries of reps that are gone or no longer summarized
+    def evict(self, rep_paths):
+        gone = set(self.entries) - set(rep_paths)
+
+        with self.db:
+            self.db.executemany("DELETE FROM reps WHERE rep_path=?", [(rep_path,) for rep_path in gone])
+
+        for rep_path in gone:
+            del self.entries[rep_path]
+
+        return len(gone)
+
+    def commit(self):
+        self.db.commit()
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
@@ -0,0 +1,119 @@
+import os
+import sys
+import json
+import numpy as np
+
+# file helpers shared with chain.py
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "agent"))
+from fileutil import replaceFile
+
+SCHEMA = "schema.json"
+# dictionary-encoded: codes in the column file, values in the schema
+KEYS = ["condition","vowel","replication","chain_gen"]
+DTYPES = {"key": "<u4", "generation": "<i4", "value": "<f8"}
+
+# repeated csv names (e.g. per-vowel and global nishimura values) become name.1, name.2, ...
+def uniqueNames(header):
+    (names,seen) = ([],{})
+
+    for name in header:
+        if name in seen:
+            seen[name] += 1
+            names.append(name + "." + str(seen[name]))
+        else:
+            seen[name] = 0
+            names.append(name)
+
+    return names
+
+# summary.csv as one little-endian binary file per column plus schema.json, written rep by rep;
+# the schema is written last, so an export without one is incomplete
+class ColumnWriter(object):
+    def __init__(self, export_path):
+        self.export_path = export_path
+        self.columns = None
+        self.n_rows = 0
+
+        if not os.path.exists(export_path):
+            os.makedirs(export_path)
+
+        if os.path.exists(os.path.join(export_path, SCHEMA)):
+            os.remove(os.path.join(export_path, SCHEMA))
+
+    def start(self, header):
+        self.columns = []
+        self.codes = {}
+        self.files = []
+
+        for (i_column,name) in enumerate(uniqueNames(header)):
+            if name in KEYS:
+                column = {"name": name, "dtype": DTYPES["key"], "encoding": "dictionary"}
+                self.codes[i_column] = {}
+            else:
+                column = {"name": name, "dtype": DTYPES["generation" if name == "generation" else "value"]}
+
+            column["file"] = "%03d.bin" % i_column
+            self.columns.append(column)
+            self.files.append(open(os.path.join(self.export_path, column["file"]), 'wb'))
+
+    def write(self, header, rows):
+        if self.columns is None:
+            self.start(header)
+
+        for (i_column,values) in enumerate(zip(*rows)):
+            if i_column in self.codes:
+                codes = self.codes[i_column]
+                values = [codes.setdefault(value, len(codes)) for value in values]
+
+            np.asarray(values, dtype=self.columns[i_column]["dtype"]).tofile(self.files[i_column])
+
+        self.n_rows += len(rows)
+
+    def writeSchema(self):
+        for (i_column,column) in enumerate(self.columns or []):
+            if i_column in self.codes:
+                codes = self.codes[i_column]
+                column["dictionary"] = sorted(codes, key=codes.get)
+
+        schema_path = os.path.join(self.export_path, SCHEMA)
+        with open(schema_path + ".tmp", 'wb') as schema_file:
+            json.dump({"n_rows": self.n_rows, "columns": self.columns or []}, schema_file, indent=1)
+
+        replaceFile(schema_path + ".tmp", schema_path)
+
+    # readable up to the rows written so far, while more are still to come
+    def checkpoint(self):
+        for column_file in getattr(self, "files", []):
+            column_file.flush()
+        self.writeSchema()
+
+    def close(self):
+        for column_file in getattr(self, "files", []):
+            column_file.close()
+        self.writeSchema()
+
+def readSchema(export_path):
+    with open(os.path.join(export_path, SCHEMA), 'rb') as schema_file:
+        return json.load(schema_file)
+
+# selected columns (all by default) as arrays mapped from disk; keys decoded to their values unless decode is False
+def readColumns(export_path, names=None, decode=True):
+    schema = readSchema(export_path)
+    n_rows = schema["n_rows"]
+    columns = {}
+
+    for column in schema["columns"]:
+        if names is not None and column["name"] not in names:
+            continue
+
+        if n_rows:
+            values = np.memmap(os.path.join(export_path, column["file"]), dtype=column["dtype"], mode='r', shape=(n_rows,))
+        else:
+            values = np.zeros(0, dtype=column["dtype"])
+
+        if decode and "dictionary" in column:
+            values = np.asarray(column["dictionary"])[values]
+
+        columns[column["name"]] = values
+
+    return columns
@@ -0,0 +1,199 @@
+import os
+import re
+import csv
+import json
+import glob
+import sqlite3
+import numpy as np
+import xml.etree.ElementTree as ET
+from summarycolumns import KEYS, uniqueNames
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value);
+CREATE TABLE IF NOT EXISTS rows (condition TEXT, vowel TEXT, replication INTEGER, chain_gen INTEGER, offset INTEGER);
+CREATE INDEX IF NOT EXISTS rows_key ON rows (condition, vowel, replication, chain_gen);
+CREATE TABLE IF NOT EXISTS shapes (condition TEXT, vowel TEXT, replication INTEGER, chain_gen INTEGER, path TEXT, offset INTEGER, length INTEGER);
+CREATE INDEX IF NOT EXISTS shapes_key ON shapes (condition, vowel, replication, chain_gen);
+"""
+
+# shapes written by summarize.py: <condition>_rep<replication>.<chain_gen>_<vowel>, vowel "target.<v>" for targets
+SHAPE_NAME = re.compile(r'<shape name="([^"]*)_rep(\d+)\.(\d+)_([^"]*)"')
+
+def fileSignature(path):
+    try:
+        info = os.stat(path)
+        return (info.st_size,info.st_mtime)
+    except OSError:
+        return (0,None)
+
+# index of summary.csv rows and speaker shapes (JD2.speaker or JD2.<condition>.speaker) by (condition, vowel,
+# replication, chain_gen), kept in _summary_index.sqlite in the results root and brought up to date on opening:
+# rows appended to summary.csv since (as in follow mode) are added, anything else rebuilds the part that changed
+class SummaryIndex(object):
+    def __init__(self, root="./", rebuild=False):
+        self.root = root
+        self.summary_path = os.path.join(root, "summary.csv")
+
+        self.db = sqlite3.connect(os.path.join(root, "_summary_index.sqlite"))
+        self.db.executescript(SCHEMA)
+        self.db.text_factory = str
+
+        if rebuild:
+            with self.db:
+                self.db.execute("DELETE FROM meta")
+
+        self.update()
+
+    def meta(self, key, default=None):
+        row = self.db.execute("SELECT value FROM meta WHERE key=?", (key,)).fetchone()
+        return row[0] if row is not None else default
+
+    def setMeta(self, key, value):
+        self.db.execute("INSERT OR REPLACE INTO meta VALUES (?,?)", (key, value))
+
+    def update(self):
+        with self.db:
+            self.updateRows()
+            self.updateShapes()
+
+    def updateRows(self):
+        (size,mtime) = fileSignature(self.summary_path)
+
+        if (size,mtime) == (self.meta("summary_size"),self.meta("summary_mtime")):
+            return
+
+        # not written yet, or removed
+        if mtime is None:
+            self.db.execute("DELETE FROM rows")
+            self.db.execute("DELETE FROM meta WHERE key LIKE 'summary_%'")
+            return
+
+        with open(self.summary_path, 'rb') as summary_file:
+            header = summary_file.readline()
+            (indexed,last) = (self.meta("summary_indexed", 0),self.meta("summary_last", ""))
+
+            # appended to since, if the last line indexed is still in place; summarize.py rewrites the file
+            # from scratch on every run, moving the rows
+            summary_file.seek(max(indexed - len(last), 0))
+            if header != self.meta("summary_header") or size < indexed or summary_file.read(len(last)) != last:
+                self.db.execute("DELETE FROM rows")
+                (indexed,last) = (len(header),header)
+
+            summary_file.seek(indexed)
+            data = summary_file.read(size - indexed)
+
+        # complete lines only, the last one may still be being written
+        data = data[:data.rfind("\n") + 1]
+        if len(data):
+            last = data[data.rfind("\n", 0, len(data) - 1) + 1:]
+        offsets = indexed + np.concatenate(([0], np.flatnonzero(np.frombuffer(data, dtype=np.uint8) == ord("\n"))[:-1] + 1)) \
+            if len(data) else []
+
+        rows = ((line.split(",", 4)[:4],offset) for (line,offset) in zip(data.splitlines(), offsets))
+        self.db.executemany("INSERT INTO rows VALUES (?,?,?,?,?)",
+                            ((condition, vowel, int(replication), int(chain_gen), int(offset))
+                             for ((condition,vowel,replication,chain_gen),offset) in rows))
+
+        self.setMeta("summary_header", header)
+        self.setMeta("summary_indexed", indexed + len(data))
+        self.setMeta("summary_last", last)
+        self.setMeta("summary_size", size)
+        self.setMeta("summary_mtime", mtime)
+
+    # speaker files are rewritten rather than appended to, so they are indexed again whenever one changed
+    def updateShapes(self):
+        speaker_paths = sorted(glob.glob(os.path.join(self.root, "JD2*.speaker")))
+        signature = json.dumps([(os.path.basename(path),fileSignature(path)) for path in speaker_paths])
+
+        if signature == self.meta("speaker_signature"):
+            return
+
+        self.db.execute("DELETE FROM shapes")
+        shapes = []
+
+        for speaker_path in speaker_paths:
+            with open(speaker_path, 'rb') as speaker_file:
+                data = speaker_file.read()
+
+            for match in SHAPE_NAME.finditer(data):
+                end = data.index("</shape>", match.start()) + len("</shape>")
+                (condition,replication,chain_gen,vowel) = match.groups()
+                shapes.append((condition, vowel, int(replication), int(chain_gen), speaker_path, match.start(), end - match.start()))
+
+        self.db.executemany("INSERT INTO shapes VALUES (?,?,?,?,?,?,?)", shapes)
+        self.setMeta("speaker_signature", signature)
+
+    def where(self, keys):
+        unknown = set(keys) - set(KEYS)
+        if unknown:
+            raise ValueError("unknown keys: " + ", ".join(sorted(unknown)))
+
+        names = [name for name in KEYS if keys.get(name) is not None]
+        clause = " AND ".join(name + "=?" for name in names)
+
+        return (" WHERE " + clause if clause else "",[keys[name] for name in names])
+
+    # column names as in the columns export, repeated ones made unique
+    def header(self):
+        return uniqueNames(csv.reader([self.meta("summary_header", "")]).next())
+
+    # file offsets of the rows with the given keys, in file order
+    def rowOffsets(self, **keys):
+        (clause,args) = self.where(keys)
+        return [offset for (offset,) in self.db.execute("SELECT offset FROM rows" + clause + " ORDER BY offset", args)]
+
+    # key columns and the given value columns (all by default) of the selected rows, as arrays;
+    # only the selected rows are read
+    def rows(self, columns=None, **keys):
+        header = self.header()
+        i_columns = [header.index(name) for name in (columns or header[len(KEYS):])]
+
+        (lines,offsets) = ([],self.rowOffsets(**keys))
+        if len(offsets):
+            with open(self.summary_path, 'rb') as summary_file:
+                for offset in offsets:
+                    summary_file.seek(offset)
+                    lines.append(csv.reader([summary_file.readline()]).next())
+
+        selected = {}
+        for (i_column,name) in enumerate(KEYS):
+            selected[name] = np.array([line[i_column] for line in lines], dtype=int if name in ("replication","chain_gen") else str)
+        for i_column in i_columns:
+            selected[header[i_column]] = np.array([line[i_column] for line in lines], dtype=float).reshape(-1)
+
+        return selected
+
+    # one value over chain generations, e.g. trajectory("A01", "i", "F1_elite"): chain_gens and values sorted by
+    # chain_gen; the condition is the anatomy, so sets with other vowels alongside give a row each
+    def trajectory(self, condition, vowel, column, replication=None):
+        selected = self.rows([column], condition=condition, vowel=vowel, replication=replication)
+        order = np.argsort(selected["chain_gen"], kind="mergesort")
+
+        return (selected["chain_gen"][order],selected[column][order])
+
+    # speaker shapes with the given keys: their keys, parameter names and a values array (one row per shape)
+    def shapes(self, **keys):
+        (clause,args) = self.where(keys)
+        entries = self.db.execute("SELECT condition, vowel, replication, chain_gen, path, offset, length FROM shapes" +
+                                  clause + " ORDER BY path, offset", args).fetchall()
+
+        (names,values,speaker_file) = (None,[],None)
+        for (_,_,_,_,speaker_path,offset,length) in entries:
+            if speaker_file is None or speaker_file.name != speaker_path:
+                if speaker_file is not None:
+                    speaker_file.close()
+                speaker_file = open(speaker_path, 'rb')
+
+            speaker_file.seek(offset)
+            params = ET.fromstring(speaker_file.read(length)).findall("param")
+
+            names = names or [param.get("name") for param in params]
+            values.append([float(param.get("value")) for param in params])
+
+        if speaker_file is not None:
+            speaker_file.close()
+
+        return ([entry[:4] for entry in entries],names or [],np.array(values, dtype=float))
+
+    def close(self):
+        self.db.close()